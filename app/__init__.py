@@ -4,4 +4,6 @@ from .entities import *
 from .mappers import *
 from .modules import *
 from .queries import *
-from .embeddings import *
\ No newline at end of file
+from .embeddings import *
+from .ingestion import *
+from .evaluation import *
\ No newline at end of file
@@ -1,8 +1,9 @@
 import os
+import asyncio
 import uvicorn
 from typing import Dict, Any
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse,JSONResponse
 from fastapi.security.api_key import APIKeyHeader
 from dotenv import load_dotenv
@@ -32,7 +33,10 @@ async def lifespan(app: FastAPI):
     logging.info("Initializing Modules...")
     modules = Modules()
     logging.info("Modules initialized.")
+    warmup_task = asyncio.create_task(modules.warmup.run())
     yield
+    warmup_task.cancel()
+    await modules.chatbot.close()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -41,8 +45,21 @@ def reply():
     json_compatible_item_data = {"hello" : "world"}
     return JSONResponse(content=json_compatible_item_data)
 
+@app.get("/healthz")
+def healthz():
+    return JSONResponse(content={"status": "alive"})
+
+@app.get("/readyz")
+def readyz():
+    report = modules.warmup.report()
+    return JSONResponse(content=report, status_code=200 if report["ready"] else 503)
+
+@app.get("/v1/api/readiness")
+async def readiness(api_key: str = Depends(get_token)) -> Dict[str, Any]:
+    return JSONResponse(content=modules.warmup.details())
+
 @app.post("/v1/api/chat")
-async def answer(data: dict, api_key: str = Depends(get_token)) -> StreamingResponse:
+async def answer(data: dict, request: Request, api_key: str = Depends(get_token)) -> StreamingResponse:
     if 'question' not in data:
         raise HTTPException(status_code=400, detail="question field is missing")
     if 'session_id' not in data:
@@ -52,12 +69,18 @@ async def answer(data: dict, api_key: str = Depends(get_token)) -> StreamingResp
     if 'acc_rec' not in data:
         raise HTTPException(status_code=400, detail="acc_rec field is missing")  
     
+    events = modules.chatbot.chat_events(
+        data['question'], data['session_id'], data['id'], data['acc_rec'],
+        is_disconnected=request.is_disconnected)
     return StreamingResponse(
-        modules.chatbot.chat(data['question'], data['session_id'], data['id'], data['acc_rec']), 
-        media_type="text/event-stream")
+        modules.chatbot.utils.profiler.trace_stream(
+            events, "chat", profiled=request.headers.get("X-Profile") == "1",
+            metadata={"session_id": data['session_id']}), 
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.post("/v1/api/chat_prompt")
-async def answer_prompt(data: dict, api_key: str = Depends(get_token)) -> Dict[str, Any]:
+async def answer_prompt(data: dict, request: Request, api_key: str = Depends(get_token)) -> Dict[str, Any]:
     if 'question' not in data:
         raise HTTPException(status_code=400, detail="question field is missing")
     if 'session_id' not in data:
@@ -66,9 +89,16 @@ async def answer_prompt(data: dict, api_key: str = Depends(get_token)) -> Dict[s
         raise HTTPException(status_code=400, detail="id field is missing")  
     if 'acc_rec' not in data:
         raise HTTPException(status_code=400, detail="acc_rec field is missing")  
-    answer = await modules.chatbot.chat_prompt_answer(data['question'], data['session_id'], data['id'], data['acc_rec'])
+    async with modules.chatbot.utils.profiler.trace(
+            "chat_prompt", profiled=request.headers.get("X-Profile") == "1",
+            metadata={"session_id": data['session_id']}):
+        answer = await modules.chatbot.chat_prompt_answer(data['question'], data['session_id'], data['id'], data['acc_rec'])
     return JSONResponse(content=answer)
 
+@app.get("/v1/api/metrics")
+async def metrics(api_key: str = Depends(get_token)) -> Dict[str, Any]:
+    return JSONResponse(content=modules.chatbot.utils.metrics.snapshot())
+
 if __name__ == "__main__":
     uvicorn.run(
         "app:app",
@@ -14,4 +14,7 @@ class MiniLM:
         self.model: SentenceTransformer = SentenceTransformer('./app/embeddings/models/minilm-l6-v2', device='cuda')
 
     def get_embeddings(self, text: str) -> List[float]:
-        return self.model.encode([text])[0].tolist()
\ No newline at end of file
+        return self.model.encode([text])[0].tolist()
+
+    def get_embeddings_batch(self, texts: List[str], batch_size: int = 128) -> List[List[float]]:
+        return self.model.encode(texts, batch_size=batch_size).tolist()
\ No newline at end of file
@@ -0,0 +1,63 @@
+import sys
+import json
+import asyncio
+import argparse
+from dotenv import load_dotenv
+load_dotenv()
+
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+from modules.chatbot import ChatBot
+from evaluation import Evaluation
+
+def parse_int_list(value: str):
+    return [int(item) for item in value.split(",")]
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Evaluate retrieval quality against latency on a labeled question set.")
+    parser.add_argument("dataset", nargs="?", help="JSON lines file of questions with question and expected_origin fields")
+    parser.add_argument("--k", type=parse_int_list, default=[5, 10, 20], help="comma separated result sizes")
+    parser.add_argument("--overfetch", type=parse_int_list, default=[1, 5, 10], help="comma separated over-fetch factors")
+    parser.add_argument("--partition", choices=["on", "off", "both"], default="both", help="language partitioned search")
+    parser.add_argument("--collections", help="comma separated collections to search, defaults to all")
+    parser.add_argument("--snapshot", help="search a local JSON lines snapshot of the collections instead of Mongo")
+    parser.add_argument("--export-snapshot", help="write a snapshot of the Mongo collections to this file and exit")
+    parser.add_argument("--no-rephrase", action="store_true", help="embed the questions without rephrasing them")
+    parser.add_argument("--output", help="JSON lines file the records are appended to, defaults to stdout")
+    return parser.parse_args()
+
+async def main() -> None:
+    args = parse_args()
+    chatbot = ChatBot()
+    try:
+        evaluation = Evaluation(chatbot, rephrase=not args.no_rephrase, snapshot_path=args.snapshot)
+        if args.export_snapshot:
+            count = await evaluation.export_snapshot(args.export_snapshot)
+            logging.info(f"Exported {count} documents to {args.export_snapshot}")
+            return
+
+        if not args.dataset:
+            raise SystemExit("dataset is required unless --export-snapshot is given")
+        partitions = {"on": [True], "off": [False], "both": [False, True]}[args.partition]
+        try:
+            records = await evaluation.run(
+                args.dataset, args.k, args.overfetch, partitions,
+                collection_names=args.collections.split(",") if args.collections else None,
+            )
+        except ValueError as e:
+            raise SystemExit(str(e))
+    finally:
+        await chatbot.close()
+
+    output = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for record in records:
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1 @@
+from .evaluation import Evaluation
\ No newline at end of file
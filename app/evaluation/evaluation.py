@@ -0,0 +1,278 @@
+import re
+import json
+import time
+import heapq
+import itertools
+import statistics
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from utils import estimate_tokens
+from modules.chatbot import ChatBot
+
+class Evaluation:
+    """
+    Replays labeled questions through the retrieval pipeline to measure recall against latency.
+
+    Each question goes through the same steps as a chat request up to the answer model:
+    language detection, rephrasing, MPNet embedding and vector search, either against Mongo
+    or against a local snapshot of the collections. The search is repeated for every setting
+    of the grid, and one record of metrics is produced per setting.
+
+    Both sources apply the chatbot's language field filter and cross-language fallback. The
+    search deadline and hedging only apply to Mongo, a record notes the features applied.
+
+    A retrieved chunk is relevant when its origin starts with the expected origin, compared
+    case-insensitively with whitespace and arrows normalized.
+
+    Attributes:
+        chatbot (ChatBot): The chatbot whose prompts, models and queries are evaluated.
+        rephrase (bool): Whether questions are rephrased before being embedded.
+        snapshot (Dict[str, Dict[str, Any]] | None): Documents and normalized embeddings by collection.
+    """
+
+    def __init__(self, chatbot: ChatBot, rephrase: bool = True, snapshot_path: Optional[str] = None):
+        self.chatbot = chatbot
+        self.rephrase = rephrase
+        self.snapshot = self._load_snapshot(snapshot_path) if snapshot_path is not None else None
+
+    async def run(
+            self,
+            dataset_path: str,
+            ks: List[int],
+            overfetches: List[int],
+            partitions: List[bool],
+            collection_names: Optional[List[str]] = None,
+        ) -> List[Dict[str, Any]]:
+        """
+        Evaluate every combination of the grid over the labeled dataset.
+
+        Args:
+            dataset_path (str): JSON lines file of questions with `question`, `expected_origin`
+                (a string or a list of strings) and optionally `history`.
+            ks (List[int]): Numbers of results returned by the vector search.
+            overfetches (List[int]): Factors of k fetched from each collection before grouping.
+            partitions (List[bool]): Whether questions only search their own language's collections.
+            collection_names (List[str], optional): Collections searched. Defaults to all collections.
+
+        Returns:
+            List[Dict[str, Any]]: One record of settings and metrics per combination of the grid.
+
+        Raises:
+            ValueError: If a collection is not in the searched source, or the dataset is empty.
+        """
+        available_names = (
+            list(self.snapshot) if self.snapshot is not None
+            else await self.chatbot.dbs.mongo.get_collection_names())
+        if collection_names is None:
+            collection_names = available_names
+        unknown_names = sorted(set(collection_names) - set(available_names))
+        if unknown_names:
+            raise ValueError(
+                f"Unknown collections: {', '.join(unknown_names)}. Available: {', '.join(sorted(available_names))}")
+        questions = await self._prepare_questions(dataset_path)
+        features = self._search_features()
+
+        records = []
+        for k, overfetch, partition in itertools.product(ks, overfetches, partitions):
+            reciprocal_ranks, context_tokens, search_latencies = [], [], []
+            for question in questions:
+                lang = question["lang"] if partition and question["lang"] in self.chatbot.vector_search_languages else None
+                start = time.perf_counter()
+                results = await self._search(question["embedding"], k, overfetch, lang, collection_names)
+                search_latencies.append(time.perf_counter() - start)
+
+                context = "".join(f"Origin: {ele['origin']}\nContent: {ele['content']}\n---" for ele in results)
+                context_tokens.append(estimate_tokens(context))
+                rank = next(
+                    (rank for rank, ele in enumerate(results, start=1)
+                     if self._is_relevant(ele['origin'], question["expected_origins"])), None)
+                reciprocal_ranks.append(1 / rank if rank is not None else 0.0)
+
+            records.append({
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "source": "snapshot" if self.snapshot is not None else "mongo",
+                "embedding_model": "mpnet",
+                "rephrase": self.rephrase,
+                "settings": {"k": k, "overfetch": overfetch, "language_partition": partition,
+                             "collections": sorted(collection_names), **features},
+                "questions": len(questions),
+                "recall_at_k": sum(rr > 0 for rr in reciprocal_ranks) / len(questions),
+                "mrr": sum(reciprocal_ranks) / len(questions),
+                "context_tokens": self._summarize(context_tokens),
+                "latency_ms": {
+                    "rephrase": self._summarize([q["rephrase_latency"] * 1000 for q in questions]),
+                    "embed": self._summarize([q["embed_latency"] * 1000 for q in questions]),
+                    "search": self._summarize([latency * 1000 for latency in search_latencies]),
+                },
+            })
+        return records
+
+    async def _prepare_questions(self, dataset_path: str) -> List[Dict[str, Any]]:
+        # Rephrasing and embedding do not depend on the grid, they are done once per question
+        questions = []
+        with open(dataset_path, encoding="utf-8") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                expected = item["expected_origin"]
+                question = {
+                    "expected_origins": [expected] if isinstance(expected, str) else expected,
+                    "lang": self.chatbot._detect_language(item["question"]),
+                    "rephrase_latency": 0.0,
+                }
+
+                query = item["question"]
+                if self.rephrase:
+                    start = time.perf_counter()
+                    query = await self.chatbot._rephrase(
+                        self.chatbot._get_rephrase_prompt(item["question"], item.get("history", [])))
+                    question["rephrase_latency"] = time.perf_counter() - start
+
+                start = time.perf_counter()
+                question["embedding"] = self.chatbot.embeddings.mpnet.get_embeddings(query)
+                question["embed_latency"] = time.perf_counter() - start
+                questions.append(question)
+
+        if not questions:
+            raise ValueError(f"No question found in {dataset_path}")
+        return questions
+
+    def _search_features(self) -> Dict[str, Any]:
+        mongo = self.snapshot is None
+        return {
+            "lang_field": self.chatbot.vector_search_lang_field,
+            "fallback_score": self.chatbot.vector_search_fallback_score,
+            "deadline": self.chatbot.vector_search_deadline if mongo else None,
+            "hedge_after": self.chatbot.vector_search_hedge_after if mongo else None,
+        }
+
+    async def _search(
+            self, embedding: List[float], k: int, overfetch: int, lang: Optional[str], collection_names: List[str]
+        ) -> List[Dict[str, Any]]:
+        if self.snapshot is None:
+            return await self.chatbot.queries.mongo.multi_collection_vector_search(
+                self.chatbot.dbs.mongo, embedding, k=k, overfetch=overfetch, lang=lang,
+                deadline=self.chatbot.vector_search_deadline,
+                hedge_after=self.chatbot.vector_search_hedge_after,
+                lang_field=self.chatbot.vector_search_lang_field,
+                fallback_score=self.chatbot.vector_search_fallback_score,
+                collection_names=collection_names)
+        return self._search_snapshot(embedding, k, overfetch, lang, collection_names)
+
+    def _search_snapshot(
+            self, embedding: List[float], k: int, overfetch: int, lang: Optional[str], collection_names: List[str]
+        ) -> List[Dict[str, Any]]:
+        # Mirrors the language partition, filter and fallback of multi_collection_vector_search
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query)
+        if lang is None:
+            return self._search_snapshot_collections(query, collection_names, k, overfetch)
+
+        lang_field = self.chatbot.vector_search_lang_field
+        fallback_score = self.chatbot.vector_search_fallback_score
+        collection_language = self.chatbot.queries.mongo._collection_language
+        own_names = [name for name in collection_names if collection_language(name) in (lang, None)]
+        other_names = [name for name in collection_names if name not in own_names]
+        filtered_names = []
+        if lang_field is not None:
+            filtered_names = [name for name in own_names if collection_language(name) is None]
+        results = self._search_snapshot_collections(
+            query, own_names, k, overfetch, {name: (lang_field, lang) for name in filtered_names})
+
+        fallback_names = other_names + filtered_names
+        if fallback_score is None or (results and results[0]["score"] >= fallback_score) or not fallback_names:
+            return results
+
+        fallback_results = self._search_snapshot_collections(query, fallback_names, k, overfetch)
+        merged = {(item["collection"], item["_index"]): item for item in fallback_results + results}
+        return heapq.nlargest(k, merged.values(), key=lambda item: item["score"])
+
+    def _search_snapshot_collections(
+            self,
+            query: np.ndarray,
+            collection_names: List[str],
+            k: int,
+            overfetch: int,
+            search_filters: Optional[Dict[str, Tuple[str, str]]] = None,
+        ) -> List[Dict[str, Any]]:
+        search_filters = search_filters or {}
+        results = []
+        for name in collection_names:
+            collection = self.snapshot[name]
+            scores = collection["embeddings"] @ query
+            if name in search_filters:
+                # Same as the $eq filter of the cosmosSearch stage, documents without the field never match
+                field, value = search_filters[name]
+                scores = np.where(
+                    [document.get(field) == value for document in collection["documents"]], scores, -np.inf)
+            top = [index for index in np.argsort(-scores)[:k * overfetch] if np.isfinite(scores[index])]
+
+            # Same grouping on content as the cosmosSearch pipeline
+            seen = set()
+            for index in top:
+                document = collection["documents"][index]
+                if document["content"] in seen:
+                    continue
+                seen.add(document["content"])
+                results.append({**document, "score": float(scores[index]), "collection": name, "_index": int(index)})
+
+        results.sort(key=lambda item: item["score"], reverse=True)
+        return results[:k]
+
+    def _load_snapshot(self, snapshot_path: str) -> Dict[str, Dict[str, Any]]:
+        documents: Dict[str, List[Dict[str, Any]]] = {}
+        embeddings: Dict[str, List[List[float]]] = {}
+        with open(snapshot_path, encoding="utf-8") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                document = json.loads(line)
+                name = document.pop("collection")
+                embeddings.setdefault(name, []).append(document.pop("embedding"))
+                documents.setdefault(name, []).append(document)
+
+        snapshot = {}
+        for name, vectors in embeddings.items():
+            matrix = np.asarray(vectors, dtype=np.float32)
+            matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+            snapshot[name] = {"documents": documents[name], "embeddings": matrix}
+        return snapshot
+
+    async def export_snapshot(self, snapshot_path: str) -> int:
+        """
+        Write every document of every collection, embeddings included, to a local snapshot.
+
+        Args:
+            snapshot_path (str): The JSON lines file to write.
+
+        Returns:
+            int: The number of documents written.
+        """
+        fields = {"_id": 0, "content": 1, "chunk": 1, "origin": 1, "vertex": 1, "embedding": 1}
+        if self.chatbot.vector_search_lang_field is not None:
+            fields[self.chatbot.vector_search_lang_field] = 1
+        count = 0
+        with open(snapshot_path, "w", encoding="utf-8") as file:
+            for name in await self.chatbot.dbs.mongo.get_collection_names():
+                async for document in self.chatbot.dbs.mongo.db[name].find({"embedding": {"$exists": True}}, fields):
+                    file.write(json.dumps({"collection": name, **document}, ensure_ascii=False, default=str) + "\n")
+                    count += 1
+        return count
+
+    def _is_relevant(self, origin: str, expected_origins: List[str]) -> bool:
+        origin = self._normalize_origin(origin)
+        return any(origin.startswith(self._normalize_origin(expected)) for expected in expected_origins)
+
+    def _normalize_origin(self, origin: str) -> str:
+        origin = re.sub(r"\s*(->|→|>)\s*", " → ", str(origin))
+        return re.sub(r"\s+", " ", origin).strip().lower()
+
+    def _summarize(self, values: List[float]) -> Dict[str, float]:
+        ordered = sorted(values)
+        return {
+            "mean": round(statistics.fmean(ordered), 2),
+            "p50": round(ordered[len(ordered) // 2], 2),
+            "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+        }
@@ -0,0 +1,38 @@
+import asyncio
+import argparse
+from dotenv import load_dotenv
+load_dotenv()
+
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+from ingestion import Ingestion
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Incrementally ingest source documents into the knowledge base.")
+    parser.add_argument("source", help="JSON lines file, or directory of .jsonl files, with one source document per line")
+    parser.add_argument("--model", default="mpnet", choices=["mpnet", "minilm"], help="embedding model")
+    parser.add_argument("--chunk-size", type=int, default=1500, help="maximum characters per chunk")
+    parser.add_argument("--chunk-overlap", type=int, default=200, help="characters shared by consecutive chunks")
+    parser.add_argument("--batch-size", type=int, default=256, help="source documents per batch")
+    parser.add_argument("--encode-batch-size", type=int, default=128, help="embedding model batch size")
+    parser.add_argument("--checkpoint", default=".ingestion_checkpoint.json", help="checkpoint file used to resume")
+    parser.add_argument("--no-resume", action="store_true", help="ignore any existing checkpoint")
+    return parser.parse_args()
+
+async def main() -> None:
+    args = parse_args()
+    ingestion = Ingestion(
+        model_name=args.model,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        batch_size=args.batch_size,
+        encode_batch_size=args.encode_batch_size,
+        checkpoint_path=args.checkpoint,
+    )
+    stats = await ingestion.run(args.source, resume=not args.no_resume)
+    logging.info(f"Ingestion complete: {stats}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
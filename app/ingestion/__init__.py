@@ -0,0 +1 @@
+from .ingestion import Ingestion
\ No newline at end of file
@@ -0,0 +1,54 @@
+import hashlib
+from typing import List
+
+
+def split_text(text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
+    """
+    Split a text into chunks, packing consecutive paragraphs up to the chunk size.
+
+    A paragraph longer than the chunk size is cut into windows sharing `chunk_overlap`
+    characters. Blank paragraphs are dropped, so no chunk is ever empty.
+
+    Args:
+        text (str): The text to split, paragraphs separated by blank lines.
+        chunk_size (int): Maximum number of characters per chunk.
+        chunk_overlap (int): Number of characters shared by consecutive windows of a long paragraph.
+
+    Returns:
+        List[str]: The chunks, in order.
+    """
+    chunks = []
+    current = ""
+    for paragraph in (p.strip() for p in text.split("\n\n")):
+        if not paragraph:
+            continue
+        if len(paragraph) > chunk_size:
+            if current:
+                chunks.append(current)
+                current = ""
+            step = chunk_size - chunk_overlap
+            chunks.extend(paragraph[i:i + chunk_size] for i in range(0, len(paragraph) - chunk_overlap, step))
+        elif current and len(current) + len(paragraph) + 2 > chunk_size:
+            chunks.append(current)
+            current = paragraph
+        else:
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def hash_chunk(model_name: str, source: str, origin: str, text: str) -> str:
+    """
+    Hash a chunk together with everything its embedding depends on.
+
+    Args:
+        model_name (str): Name of the embedding model.
+        source (str): Identifier of the source document.
+        origin (str): Origin of the chunk.
+        text (str): Content of the chunk.
+
+    Returns:
+        str: The hexadecimal SHA-256 digest, used as the chunk `_id`.
+    """
+    return hashlib.sha256(f"{model_name}\0{source}\0{origin}\0{text}".encode("utf-8")).hexdigest()
@@ -0,0 +1,236 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, Iterator, List, Set, Tuple
+
+from pymongo import UpdateOne, DeleteMany
+from utils import Utils
+from databases import Databases
+from embeddings import Embeddings
+from .chunking import split_text, hash_chunk
+
+
+class Ingestion:
+    """
+    Incrementally loads source documents into the vector search collections.
+
+    Source documents are read as JSON lines, one document per line, with the fields
+    `collection`, `origin`, `content` and optionally `vertex` and `lang`. Each document is
+    chunked and every chunk is hashed together with the embedding model name, so only new
+    or changed chunks are embedded.
+
+    A source document is identified in its collection by its `vertex` when given, otherwise
+    by its `origin`, the fields the documents already in the collections carry. On every
+    ingestion, the documents matching that identifier that are not one of its current chunks,
+    including those loaded by another pipeline, are removed as stale. Records of a run sharing
+    an identifier are treated as parts of the same document, and their chunks are all kept.
+    A run resumed from a checkpoint only knows the records read since it resumed.
+
+    Progress is checkpointed after every batch so an interrupted run can be resumed.
+
+    Attributes:
+        model_name (str): Name of the embedding model used ("mpnet" or "minilm").
+        chunk_size (int): Maximum number of characters per chunk.
+        chunk_overlap (int): Number of characters shared by consecutive chunks of a long paragraph.
+        batch_size (int): Number of source documents processed per batch.
+        encode_batch_size (int): Batch size passed to the embedding model.
+        checkpoint_path (str): Path of the file recording the last line ingested per source file.
+        dbs (Databases): Database connections instance.
+        embeddings (Embeddings): Text embeddings instance.
+    """
+
+    def __init__(
+            self,
+            model_name: str = "mpnet",
+            chunk_size: int = 1500,
+            chunk_overlap: int = 200,
+            batch_size: int = 256,
+            encode_batch_size: int = 128,
+            checkpoint_path: str = ".ingestion_checkpoint.json",
+        ):
+        if chunk_overlap >= chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        self.model_name = model_name
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.batch_size = batch_size
+        self.encode_batch_size = encode_batch_size
+        self.checkpoint_path = checkpoint_path
+        self.dbs = Databases(utils=Utils())
+        self.embeddings = Embeddings()
+        self.model = getattr(self.embeddings, model_name)
+
+    async def run(self, source: str, resume: bool = True) -> Dict[str, int]:
+        """
+        Ingest every source document found at the given path.
+
+        Args:
+            source (str): A JSON lines file, or a directory containing `.jsonl` files.
+            resume (bool): Skip the lines already ingested by a previous, interrupted run.
+
+        Returns:
+            Dict[str, int]: Counters for documents, new, unchanged and removed chunks.
+        """
+        checkpoint = self._load_checkpoint() if resume else {}
+        stats = {"documents": 0, "new_chunks": 0, "unchanged_chunks": 0, "removed_chunks": 0}
+        start = time.perf_counter()
+        # Chunk hashes of every source document ingested by the run, by collection and identifier
+        run_hashes: Dict[Tuple[str, str], Set[str]] = {}
+
+        async for path, line_number, batch in self._read_batches(source, checkpoint):
+            batch_stats = await self._ingest_batch(batch, run_hashes)
+            for key, value in batch_stats.items():
+                stats[key] += value
+            stats["documents"] += len(batch)
+
+            checkpoint[path] = line_number
+            self._save_checkpoint(checkpoint)
+
+            elapsed = time.perf_counter() - start
+            logging.info(
+                f"Ingested {stats['documents']} documents ({stats['documents'] / elapsed:.1f} docs/s): "
+                f"{stats['new_chunks']} new, {stats['unchanged_chunks']} unchanged, "
+                f"{stats['removed_chunks']} removed chunks"
+            )
+
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        return stats
+
+    async def _read_batches(
+            self, source: str, checkpoint: Dict[str, int]
+        ) -> AsyncIterator[Tuple[str, int, List[Dict[str, Any]]]]:
+        for path in self._source_files(source):
+            done = checkpoint.get(path, 0)
+            batch = []
+            line_number = 0
+            for line_number, document in self._read_documents(path):
+                if line_number <= done:
+                    continue
+                batch.append(document)
+                if len(batch) >= self.batch_size:
+                    yield path, line_number, batch
+                    batch = []
+            if batch:
+                yield path, line_number, batch
+
+    def _source_files(self, source: str) -> List[str]:
+        if os.path.isdir(source):
+            return sorted(
+                os.path.join(source, name) for name in os.listdir(source) if name.endswith(".jsonl")
+            )
+        return [source]
+
+    def _read_documents(self, path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        with open(path, encoding="utf-8") as file:
+            for line_number, line in enumerate(file, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    document = json.loads(line)
+                except json.JSONDecodeError as e:
+                    logging.error(f"Skipping invalid document at {path}:{line_number}: {e}")
+                    continue
+                yield line_number, document
+
+    async def _ingest_batch(
+            self, documents: List[Dict[str, Any]], run_hashes: Dict[Tuple[str, str], Set[str]]
+        ) -> Dict[str, int]:
+        stats = {"new_chunks": 0, "unchanged_chunks": 0, "removed_chunks": 0}
+
+        # Group chunks by collection so each collection gets a single bulk write
+        chunks_by_collection: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        sources_by_collection: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for document in documents:
+            collection_name = document["collection"]
+            source = self._source_filter(document)
+            source_key = json.dumps(source, sort_keys=True, default=str)
+            chunks = self._chunk_document(document, source_key)
+            chunks_by_collection.setdefault(collection_name, {}).update((c["_id"], c) for c in chunks)
+            sources_by_collection.setdefault(collection_name, {})[source_key] = source
+
+            hashes = run_hashes.get((collection_name, source_key))
+            if hashes is None:
+                hashes = run_hashes[(collection_name, source_key)] = set()
+            else:
+                logging.info(f"Merging chunks of records sharing {source_key} in collection {collection_name}")
+            hashes.update(c["_id"] for c in chunks)
+
+        for collection_name, chunks_by_hash in chunks_by_collection.items():
+            chunks = list(chunks_by_hash.values())
+            collection = self.dbs.mongo.db[collection_name]
+            existing = {
+                doc["_id"] async for doc in collection.find(
+                    {"_id": {"$in": [c["_id"] for c in chunks]}}, {"_id": 1})
+            }
+
+            new_chunks = [c for c in chunks if c["_id"] not in existing]
+            if new_chunks:
+                vectors = await asyncio.to_thread(
+                    self.model.get_embeddings_batch,
+                    [c["content"] for c in new_chunks],
+                    self.encode_batch_size,
+                )
+                for chunk, vector in zip(new_chunks, vectors):
+                    chunk["embedding"] = vector
+
+            operations = []
+            for chunk in chunks:
+                if chunk["_id"] in existing:
+                    # Position may have moved within the document, the embedding is still valid
+                    operations.append(UpdateOne({"_id": chunk["_id"]}, {"$set": {"chunk": chunk["chunk"]}}))
+                else:
+                    fields = {key: value for key, value in chunk.items() if key != "_id"}
+                    operations.append(UpdateOne({"_id": chunk["_id"]}, {"$set": fields}, upsert=True))
+            for source_key, source in sources_by_collection[collection_name].items():
+                hashes = sorted(run_hashes[(collection_name, source_key)])
+                operations.append(DeleteMany({**source, "_id": {"$nin": hashes}}))
+
+            result = await collection.bulk_write(operations, ordered=False)
+            stats["new_chunks"] += len(new_chunks)
+            stats["unchanged_chunks"] += len(chunks) - len(new_chunks)
+            stats["removed_chunks"] += result.deleted_count
+
+        return stats
+
+    def _source_filter(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        if "vertex" in document:
+            return {"vertex": document["vertex"]}
+        return {"origin": document["origin"]}
+
+    def _chunk_document(self, document: Dict[str, Any], source_key: str) -> List[Dict[str, Any]]:
+        chunks = []
+        seen = set()
+        for index, text in enumerate(split_text(document["content"], self.chunk_size, self.chunk_overlap)):
+            chunk_hash = hash_chunk(self.model_name, source_key, document["origin"], text)
+            if chunk_hash in seen:
+                continue
+            seen.add(chunk_hash)
+            chunk = {
+                "_id": chunk_hash,
+                "content": text,
+                "chunk": index,
+                "origin": document["origin"],
+            }
+            for field in ("vertex", "lang"):
+                if field in document:
+                    chunk[field] = document[field]
+            chunks.append(chunk)
+        return chunks
+
+    def _load_checkpoint(self) -> Dict[str, int]:
+        if not os.path.exists(self.checkpoint_path):
+            return {}
+        with open(self.checkpoint_path, encoding="utf-8") as file:
+            checkpoint = json.load(file)
+        logging.info(f"Resuming ingestion from checkpoint {self.checkpoint_path}")
+        return checkpoint
+
+    def _save_checkpoint(self, checkpoint: Dict[str, int]) -> None:
+        temp_path = f"{self.checkpoint_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(checkpoint, file)
+        os.replace(temp_path, self.checkpoint_path)
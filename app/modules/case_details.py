@@ -0,0 +1,60 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+class CaseDetails:
+    """
+    Renders mapped case details as a compact text block and caches it per case and language.
+
+    The block holds one `Label: value` line per field, nested fields are prefixed with their
+    parent label and empty fields are left out, which is much shorter than a Python dict repr.
+    Rendered blocks are kept in a bounded LRU cache keyed on (case_id, act_rec, lang) so
+    follow-up questions on the same case skip the database query and the mapping.
+
+    Attributes:
+        max_entries (int): Maximum number of rendered blocks kept in the cache.
+        ttl (float): Time in seconds after which a cached block is considered stale.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._cache: OrderedDict[Tuple[int, int, str], Tuple[float, str]] = OrderedDict()
+
+    def get(self, case_id: int, act_rec: int, lang: str) -> Optional[str]:
+        key = (case_id, act_rec, lang)
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        created, block = entry
+        if time.time() - created > self.ttl:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return block
+
+    def put(self, case_id: int, act_rec: int, lang: str, case_details_mapped: Dict[str, Any]) -> str:
+        block = self.render(case_details_mapped)
+        key = (case_id, act_rec, lang)
+        self._cache[key] = (time.time(), block)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return block
+
+    def render(self, case_details_mapped: Dict[str, Any]) -> str:
+        return "\n".join(self._render_lines(case_details_mapped, ""))
+
+    def _render_lines(self, data: Dict[str, Any], prefix: str) -> List[str]:
+        lines = []
+        for label, value in data.items():
+            if str(label).startswith("_") or value is None or value == "" or value == [] or value == {}:
+                continue
+            label = f"{prefix}{label}"
+            if isinstance(value, dict):
+                lines.extend(self._render_lines(value, f"{label} → "))
+            elif isinstance(value, (list, tuple)):
+                lines.append(f"{label}: {'; '.join(str(item) for item in value)}")
+            else:
+                lines.append(f"{label}: {value}")
+        return lines
@@ -1,21 +1,31 @@
 import os
-from openai import AsyncOpenAI
+import re
 import json
 import time
+import logging
 
 from typing import Tuple, AsyncGenerator
 from typing import AsyncGenerator
-from typing import List, Dict
+from typing import List, Dict, Callable, Awaitable
 
 import asyncio
-from utils import Utils
+from utils import Utils, estimate_tokens, span, mark
 from queries import Queries
 from databases import Databases
 from embeddings import Embeddings
-from prompts import REPHRASE_PROMPT, ANSWER_PROMPT, ANSWER_SYSTEM_MSG
+from prompts import REPHRASE_PROMPT, ANSWER_PROMPT, ANSWER_SYSTEM_MSG, SUMMARY_PROMPT
 from mappers import Mappers
+from .streaming import EventStream
+from .case_details import CaseDetails
+from .llm_pool import LLMClientPool
+from .single_flight import Flight, SingleFlight
 from langdetect import detect
 
+COMPLEX_QUESTION_PATTERN = re.compile(
+    r"\b(why|explain|compare|difference|versus|vs|calculate|pourquoi|expliqu\w*|compar\w*|diff[ée]rence|calcul\w*)\b",
+    re.IGNORECASE,
+)
+
 class ChatBot:
     """
     A chatbot class that handles conversation management, language detection, and question answering.
@@ -25,10 +35,30 @@ class ChatBot:
 
     Attributes:
         vector_search_result_size (int): Number of results to return from vector search.
+        vector_search_overfetch (int): Factor of the result size fetched from each collection before duplicates are grouped.
+        vector_search_deadline (float): Time budget in seconds of the vector search fan-out.
+        vector_search_hedge_after (float | None): Delay in seconds before a duplicate search is sent to a slow collection.
+        vector_search_languages (Tuple[str, ...]): Languages whose questions only search their own language's collections.
+        vector_search_lang_field (str | None): Document field holding the language, filtered on in the cosmosSearch stage.
+        vector_search_fallback_score (float | None): Best score below which the other languages are searched as well.
+        stream_flush_interval (float): Maximum time in seconds an answer token is buffered before being sent.
+        stream_flush_bytes (int): Buffered answer size in bytes that triggers a flush.
+        stream_heartbeat_interval (float): Time in seconds without output after which a heartbeat is sent.
+        case_details (CaseDetails): Renderer and cache of the case details blocks added to the context.
+        cascade_enabled (bool): Whether simple questions may be answered by the rephrase model.
+        cascade_min_score (float): Minimum top vector search score to answer with the rephrase model.
+        cascade_max_context_chars (int): Maximum context size in characters to answer with the rephrase model.
+        cascade_max_question_words (int): Maximum question length in words to answer with the rephrase model.
+        single_flight_enabled (bool): Whether identical concurrent requests share a single generation.
+        single_flight (SingleFlight): Registry of the generations in progress.
+        summary_enabled (bool): Whether older turns are summarized by the rephrase model, the prompts then only
+            carrying the summary and the turns it does not cover.
+        summary_recent_turns (int): Number of most recent turns kept verbatim rather than summarized.
         rephrase_prompt_history_size (int): Number of historical messages to consider for rephrasing.
         answers_prompt_history_size (int): Number of historical messages to consider for answering.
         model_name (str): Name of the language model to use.
-        client (AsyncOpenAI): AsyncOpenAI client for API calls.
+        rephrase_model_pool (LLMClientPool): Pool of clients to the rephrase model replicas.
+        answer_model_pool (LLMClientPool): Pool of clients to the answer model replicas.
         chat_histories (Dict[str, Dict[str, Any]]): Storage for chat histories by session ID.
         session_timeout (int): Timeout duration for chat sessions in seconds.
         utils (Utils): Utility instance.
@@ -40,26 +70,45 @@ class ChatBot:
     def __init__(
             self,
             vector_search_result_size=10, rephrase_prompt_history_size=3, answers_prompt_history_size=5,
+            vector_search_overfetch=5, vector_search_deadline=5.0, vector_search_hedge_after=None,
+            vector_search_languages=("en", "fr"), vector_search_lang_field=None, vector_search_fallback_score=0.8,
+            stream_flush_interval=0.02, stream_flush_bytes=64, stream_heartbeat_interval=10.0,
+            case_details_cache_size=1024, case_details_cache_ttl=600,
+            cascade_enabled=True, cascade_min_score=0.85, cascade_max_context_chars=6000, cascade_max_question_words=25,
+            single_flight_enabled=True, summary_enabled=True, summary_recent_turns=2,
             rephrase_model_name="hugging-quants/Meta-Llama-3.1-8B-Instruct-AWQ-INT4",
             answer_model_name = "hugging-quants/Meta-Llama-3.1-70B-Instruct-AWQ-INT4",
-            rephrase_model_base_url="http://localhost:10000/v1", 
-            answer_model_base_url="http://localhost:10005/v1",
+            rephrase_model_base_urls=os.environ.get('REPHRASE_MODEL_BASE_URLS', "http://localhost:10000/v1").split(','),
+            answer_model_base_urls=os.environ.get('ANSWER_MODEL_BASE_URLS', "http://localhost:10005/v1").split(','),
             api_key=os.environ['TOKEN'],
             session_timeout=3600*24,
         ):
         self.vector_search_result_size = vector_search_result_size
+        self.vector_search_overfetch = vector_search_overfetch
+        self.vector_search_deadline = vector_search_deadline
+        self.vector_search_hedge_after = vector_search_hedge_after
+        self.vector_search_languages = vector_search_languages
+        self.vector_search_lang_field = vector_search_lang_field
+        self.vector_search_fallback_score = vector_search_fallback_score
+        self.stream_flush_interval = stream_flush_interval
+        self.stream_flush_bytes = stream_flush_bytes
+        self.stream_heartbeat_interval = stream_heartbeat_interval
+        self.case_details = CaseDetails(max_entries=case_details_cache_size, ttl=case_details_cache_ttl)
+        self.cascade_enabled = cascade_enabled
+        self.cascade_min_score = cascade_min_score
+        self.cascade_max_context_chars = cascade_max_context_chars
+        self.cascade_max_question_words = cascade_max_question_words
+        self.single_flight_enabled = single_flight_enabled
+        self.single_flight = SingleFlight()
+        self.summary_enabled = summary_enabled
+        self.summary_recent_turns = summary_recent_turns
+        self._background_tasks = set()
         self.rephrase_prompt_history_size = rephrase_prompt_history_size
         self.answers_prompt_history_size = answers_prompt_history_size
         self.rephrase_model_name = rephrase_model_name
         self.answer_model_name = answer_model_name
-        self.rephrase_model_client = AsyncOpenAI(
-            base_url=rephrase_model_base_url,
-            api_key=api_key,
-        )
-        self.answer_model_client = AsyncOpenAI(
-            base_url=answer_model_base_url,
-            api_key=api_key,
-        )
+        self.rephrase_model_pool = LLMClientPool("rephrase", rephrase_model_base_urls, api_key)
+        self.answer_model_pool = LLMClientPool("answer", answer_model_base_urls, api_key)
         self.chat_histories = {}
         self.session_timeout = session_timeout
         self.utils = Utils()
@@ -80,8 +129,28 @@ class ChatBot:
         list : The chat history for the given session
         """
         if session_id not in self.chat_histories:
-            self.chat_histories[session_id] = {"history": [], "last_update": time.time()}
+            self.chat_histories[session_id] = self._new_session()
         return self.chat_histories[session_id]["history"]
+
+    def _get_chat_summary(self, session_id: str) -> Tuple[str, List[Dict[str, str]]]:
+        """
+        Retrieve the running summary of the older turns and the turns it does not cover.
+
+        Arguments:
+        session_id : str : The unique identifier for the chat session
+
+        Returns:
+        tuple : The summary, empty when no turn has been summarized yet, and the turns after it
+        """
+        if session_id not in self.chat_histories:
+            return "", []
+        session = self.chat_histories[session_id]
+        if not session["summary"]:
+            return "", session["history"]
+        return session["summary"], session["history"][session["summarized"]:]
+
+    def _new_session(self) -> Dict:
+        return {"history": [], "last_update": time.time(), "summary": "", "summarized": 0, "summarizing": False}
     
     def _update_chat_history(self, session_id: str, user_message: str, assistant_message: str) -> None:
         """
@@ -93,7 +162,7 @@ class ChatBot:
         assistant_message : str : The response from the assistant
         """
         if session_id not in self.chat_histories:
-            self.chat_histories[session_id] = {"history": [], "last_update": time.time()}
+            self.chat_histories[session_id] = self._new_session()
         
         self.chat_histories[session_id]["history"].append({"user": user_message, "assistant": assistant_message})
         self.chat_histories[session_id]["last_update"] = time.time()
@@ -101,6 +170,44 @@ class ChatBot:
         # Cleanup old sessions
         self._cleanup_old_sessions()
 
+        if self.summary_enabled:
+            self._schedule_summary(session_id)
+
+    def _schedule_summary(self, session_id: str) -> None:
+        """
+        Summarize in the background the turns older than the most recent ones, once the
+        history no longer fits in the history window.
+
+        Arguments:
+        session_id : str : The unique identifier for the chat session
+        """
+        session = self.chat_histories[session_id]
+        if len(session["history"]) <= self.answers_prompt_history_size:
+            return
+        summarize_until = len(session["history"]) - self.summary_recent_turns
+        if session["summarizing"] or summarize_until <= session["summarized"]:
+            return
+
+        session["summarizing"] = True
+        task = asyncio.create_task(self._summarize(session_id, session, summarize_until))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _summarize(self, session_id: str, session: Dict, summarize_until: int) -> None:
+        try:
+            turns = session["history"][session["summarized"]:summarize_until]
+            prompt = [{"role": "user", "content": SUMMARY_PROMPT.format(
+                session["summary"] or "-", json.dumps(turns, indent=2, ensure_ascii=False))}]
+            summary = await self._rephrase(prompt, session_id)
+
+            session["summary"] = summary
+            session["summarized"] = summarize_until
+            self.utils.metrics.observe("summary.summary_tokens", estimate_tokens(summary))
+        except Exception as e:
+            logging.error(f"Failed to summarize chat history of session {session_id}: {e}")
+        finally:
+            session["summarizing"] = False
+
 
     def _cleanup_old_sessions(self) -> None:
         """
@@ -118,13 +225,24 @@ class ChatBot:
         return detect(question)
 
     async def _common_chat_operations(self, question: str, session_id: str, case_id: int, act_rec: int):
-        lang = self._detect_language(question)
+        with span("detect_language"):
+            lang = self._detect_language(question)
         chat_history = self._get_chat_history(session_id)
-        rephrase_prompt = self._get_rephrase_prompt(question, chat_history)
-        rephrased_question = await self._rephrase(rephrase_prompt)
-
-        question_emb = self.embeddings.mpnet.get_embeddings(rephrased_question)
-        vector_search_results = await self.queries.mongo.multi_collection_vector_search(self.dbs.mongo, question_emb, k=self.vector_search_result_size)
+        chat_summary, recent_history = self._get_chat_summary(session_id)
+        self._record_history_tokens(chat_history, chat_summary, recent_history)
+        rephrase_prompt = self._get_rephrase_prompt(question, recent_history, chat_summary)
+        with span("rephrase"):
+            rephrased_question = await self._rephrase(rephrase_prompt, session_id)
+
+        with span("embed"):
+            question_emb = self.embeddings.mpnet.get_embeddings(rephrased_question)
+        with span("vector_search"):
+            vector_search_results = await self.queries.mongo.multi_collection_vector_search(
+                self.dbs.mongo, question_emb, k=self.vector_search_result_size,
+                deadline=self.vector_search_deadline, hedge_after=self.vector_search_hedge_after,
+                lang=lang if lang in self.vector_search_languages else None,
+                lang_field=self.vector_search_lang_field, fallback_score=self.vector_search_fallback_score,
+                overfetch=self.vector_search_overfetch)
 
         context = ""
         need_case_details = False
@@ -135,36 +253,210 @@ class ChatBot:
 
         # Check if case details needed
         if need_case_details:
+            with span("case_details"):
+                context += '\n\nCase Details:\n' + self._get_case_details(case_id, act_rec, lang)
+
+        answer_prompt = self._get_answer_prompt(question, context, recent_history, chat_summary)
+        use_rephrase_model = self._route_answer(question, vector_search_results, context, need_case_details)
+
+        # The whole prompt is keyed, as it holds the session's own history and summary.
+        # Requests depending on case details are specific to a case and never shared
+        flight_key = None
+        if self.single_flight_enabled and not need_case_details:
+            model_name = self.rephrase_model_name if use_rephrase_model else self.answer_model_name
+            flight_key = self.single_flight.key(model_name, answer_prompt)
+
+        return answer_prompt, chat_history, use_rephrase_model, flight_key
+
+    def _route_answer(self, question: str, vector_search_results: List[Dict], context: str, need_case_details: bool) -> bool:
+        """
+        Decide whether the question is simple enough to be answered by the rephrase model.
+
+        Arguments:
+        question : str : The question asked by the user
+        vector_search_results : list : The retrieved chunks, sorted by score
+        context : str : The context given to the answer model
+        need_case_details : bool : Whether the context includes case details
+
+        Returns:
+        bool : True to answer with the rephrase model, False to answer with the answer model
+        """
+        if not self.cascade_enabled:
+            reason = "disabled"
+        elif need_case_details:
+            reason = "case_details"
+        elif not vector_search_results or vector_search_results[0]['score'] < self.cascade_min_score:
+            reason = "low_score"
+        elif len(context) > self.cascade_max_context_chars:
+            reason = "large_context"
+        elif not self._is_simple_question(question):
+            reason = "complex_question"
+        else:
+            reason = "simple"
+
+        use_rephrase_model = reason == "simple"
+        self.utils.metrics.increment(f"cascade.route.{'rephrase' if use_rephrase_model else 'answer'}")
+        self.utils.metrics.increment(f"cascade.reason.{reason}")
+        logging.info(f"Routing answer to {self.rephrase_model_name if use_rephrase_model else self.answer_model_name}: {reason}")
+        return use_rephrase_model
+
+    def _is_simple_question(self, question: str) -> bool:
+        if len(question.split()) > self.cascade_max_question_words or question.count("?") > 1:
+            return False
+        return COMPLEX_QUESTION_PATTERN.search(question) is None
+
+    def chat_events(
+            self, question: str, session_id: str, case_id: int, act_rec: int,
+            is_disconnected: Callable[[], Awaitable[bool]] = None,
+        ) -> AsyncGenerator[str, None]:
+        """
+        Stream the answer to a question as coalesced server-sent events.
+
+        The generation, including the upstream model streams, is cancelled when the client disconnects.
+
+        Arguments:
+        question : str : The question asked by the user
+        session_id : str : The unique identifier for the chat session
+        case_id : int : The identifier of the case being worked on
+        act_rec : int : The action record of the case
+        is_disconnected : Callable : Tells whether the client has disconnected
+
+        Returns:
+        AsyncGenerator : The server-sent events framing the answer
+        """
+        stream = EventStream(
+            self.chat(question, session_id, case_id, act_rec),
+            flush_interval=self.stream_flush_interval,
+            flush_bytes=self.stream_flush_bytes,
+            heartbeat_interval=self.stream_heartbeat_interval,
+            is_disconnected=is_disconnected,
+        )
+        return stream.events()
+
+    def _get_case_details(self, case_id: int, act_rec: int, lang: str) -> str:
+        """
+        Retrieve the rendered case details block, from the cache when the case was already used.
+
+        Arguments:
+        case_id : int : The identifier of the case being worked on
+        act_rec : int : The action record of the case
+        lang : str : The language of the question
+
+        Returns:
+        str : The case details rendered as one line per field
+        """
+        case_details_block = self.case_details.get(case_id, act_rec, lang)
+        if case_details_block is None:
             case_details = vars(self.queries.postgres.get_cases_by_id_and_act_rec(self.dbs.postgres, case_id, act_rec))
             case_details_mapped = self.mappers.case_details.get_data_mapped(case_details, lang)
-            context += '\n\nCase Details:\n' + str(case_details_mapped)
-
-        answer_prompt = self._get_answer_prompt(question, context, chat_history)
-        
-        return answer_prompt, chat_history
+            case_details_block = self.case_details.put(case_id, act_rec, lang, case_details_mapped)
+        return case_details_block
 
     async def chat(self, question: str, session_id: str, case_id: int, act_rec: int) -> AsyncGenerator[str, None]:
-        answer_prompt, chat_history = await self._common_chat_operations(question, session_id, case_id, act_rec)
+        answer_prompt, chat_history, use_rephrase_model, flight_key = await self._common_chat_operations(question, session_id, case_id, act_rec)
 
-        final_answer = []
-        origin_task = asyncio.create_task(self._extract_origin(answer_prompt))
+        flight, started = self.single_flight.join(
+            flight_key,
+            lambda flight: self._generate_answer(flight, answer_prompt, session_id, use_rephrase_model))
+        if not started:
+            logging.info(f"Session {session_id} attached to an identical answer in progress")
+            self.utils.metrics.increment("single_flight.coalesced")
 
-        async for chunk in self._process_answer(answer_prompt):
+        final_answer = []
+        async for chunk in flight.subscribe():
+            if not final_answer:
+                mark("first_chunk")
             final_answer.append(chunk)
             yield chunk
 
         # Finalize processing after streaming is complete
         final_answer_str = "".join(final_answer)
-        origin = await origin_task
+        origin = flight.result
 
         # Update session data and chat history
-        self._update_session_data(session_id, question, final_answer_str, origin)
+        with span("update_session_data"):
+            await self._update_session_data(session_id, question, final_answer_str, origin)
         self._update_chat_history(session_id, question, final_answer_str)
 
-    async def _process_answer(self, answer_prompt) -> AsyncGenerator[str, None]:
+    async def _generate_answer(self, flight: Flight, answer_prompt, session_id: str, use_rephrase_model: bool) -> str:
+        """
+        Generate the answer into a flight shared by every identical request.
+
+        Arguments:
+        flight : Flight : The flight receiving the answer chunks
+        answer_prompt : list : The prompt given to the model
+        session_id : str : The unique identifier of the chat session that started the flight
+        use_rephrase_model : bool : Whether the question was routed to the rephrase model
+
+        Returns:
+        str : The origin of the answer
+        """
+        if use_rephrase_model:
+            with span("cascade_answer"):
+                answer = await self._cascade_answer(answer_prompt, session_id)
+            if answer is not None:
+                final_answer, origin = answer
+                await flight.publish(final_answer)
+                return origin
+
+        start = time.perf_counter()
+        origin_task = asyncio.create_task(self._extract_origin(answer_prompt, session_id))
+
+        try:
+            with span("answer"):
+                async for chunk in self._process_answer(answer_prompt, session_id):
+                    await flight.publish(chunk)
+            with span("wait_origin"):
+                origin = await origin_task
+        finally:
+            if not origin_task.done():
+                origin_task.cancel()
+        self.utils.metrics.observe("cascade.latency.answer", time.perf_counter() - start)
+        return origin
+
+    async def _cascade_answer(self, answer_prompt, session_id: str) -> Tuple[str, str] | None:
+        """
+        Answer with the rephrase model, validating the response before it is sent.
+
+        The response is buffered until complete, as it can only be validated once the
+        <<STOP>> token and the origin are received. An error of the rephrase model escalates
+        the question as a failed validation does.
+
+        Arguments:
+        answer_prompt : list : The prompt given to the model
+        session_id : str : The unique identifier for the chat session
+
+        Returns:
+        tuple : The answer and its origin, or None when the question must be escalated to the answer model
+        """
+        start = time.perf_counter()
+        try:
+            response = "".join([chunk async for chunk in self._answer(answer_prompt, session_id, use_rephrase_model=True)])
+        except Exception as e:
+            logging.error(f"Escalating answer to the answer model: rephrase model failed: {e}")
+            self.utils.metrics.increment("cascade.escalated")
+            self.utils.metrics.observe("cascade.latency.escalated", time.perf_counter() - start)
+            return None
+        latency = time.perf_counter() - start
+
+        answer, _, origin = response.partition("<<")
+        origin = self._clean_origin(origin)
+        if "<<STOP>>" not in response or not answer.strip() or not origin:
+            logging.info("Escalating answer to the answer model: rephrase model response failed validation")
+            self.utils.metrics.increment("cascade.escalated")
+            self.utils.metrics.observe("cascade.latency.escalated", latency)
+            return None
+
+        self.utils.metrics.observe("cascade.latency.rephrase", latency)
+        answer_latency = self.utils.metrics.mean("cascade.latency.answer")
+        if answer_latency is not None:
+            self.utils.metrics.observe("cascade.latency.saved", answer_latency - latency)
+        return answer, origin
+
+    async def _process_answer(self, answer_prompt, session_id: str) -> AsyncGenerator[str, None]:
         origin_flag = False
 
-        async for response_chunk in self._answer(answer_prompt):
+        async for response_chunk in self._answer(answer_prompt, session_id):
             if not origin_flag:
                 if "<<" in response_chunk:
                     origin_flag = True
@@ -173,17 +465,18 @@ class ChatBot:
                 else:
                     yield response_chunk
 
-    async def _extract_origin(self, answer_prompt) -> str:
+    async def _extract_origin(self, answer_prompt, session_id: str) -> str:
         origin = ""
         origin_flag = False
 
-        async for response_chunk in self._answer(answer_prompt):
-            if not origin_flag:
-                if "<<" in response_chunk:
-                    origin_flag = True
-                    origin = response_chunk.split("<<", 1)[1]
-            else:
-                origin += response_chunk
+        with span("origin"):
+            async for response_chunk in self._answer(answer_prompt, session_id):
+                if not origin_flag:
+                    if "<<" in response_chunk:
+                        origin_flag = True
+                        origin = response_chunk.split("<<", 1)[1]
+                else:
+                    origin += response_chunk
 
         return self._clean_origin(origin)
 
@@ -202,57 +495,113 @@ class ChatBot:
         return origin
 
     async def _update_session_data(self, session_id: str, question: str, final_answer: str, origin: str):
-        await self.utils.logs.upsert_session_data(
-            db=self.dbs.mongo.db,
-            collection_name=self.logs_db_name,
-            session_id=int(session_id),
-            origin=origin,
-            question=question,
-            answer=final_answer
-        )
+        try:
+            await self.utils.logs.upsert_session_data(
+                db=self.dbs.mongo.db,
+                collection_name=self.logs_db_name,
+                session_id=int(session_id),
+                origin=origin,
+                question=question,
+                answer=final_answer
+            )
+        except Exception as e:
+            logging.error(f"Failed to store session data for session {session_id}: {e}")
 
     async def chat_prompt_answer(self, question: str, session_id: str, case_id: int, act_rec: int) -> Dict[str, str]:
-        answer_prompt, chat_history = await self._common_chat_operations(question, session_id, case_id, act_rec)
+        answer_prompt, chat_history, use_rephrase_model, _ = await self._common_chat_operations(question, session_id, case_id, act_rec)
 
         final_answer = ""
-        async for response_chunk in self._answer(answer_prompt):
-            final_answer += response_chunk
+        if use_rephrase_model:
+            try:
+                async for response_chunk in self._answer(answer_prompt, session_id, use_rephrase_model=True):
+                    final_answer += response_chunk
+            except Exception as e:
+                logging.error(f"Escalating answer to the answer model: rephrase model failed: {e}")
+                final_answer = ""
+            if "<<STOP>>" not in final_answer or not self._clean_origin(final_answer.partition("<<")[2]):
+                self.utils.metrics.increment("cascade.escalated")
+                final_answer = ""
+
+        if not final_answer:
+            async for response_chunk in self._answer(answer_prompt, session_id):
+                final_answer += response_chunk
 
         self._update_chat_history(session_id, question, final_answer)
         return {"prompt": str(answer_prompt), "response": final_answer}
 
-    async def _rephrase(self, prompt: List[Dict[str, str]]) -> str:
-        completion = await self.rephrase_model_client.chat.completions.create(
-            model=self.rephrase_model_name,
-            messages=prompt,
-            temperature=0.05,
-            top_p=0.95,
-            max_tokens=500,
-            stream=False,
-        )
+    async def _rephrase(self, prompt: List[Dict[str, str]], session_id: str = None) -> str:
+        async with self.rephrase_model_pool.acquire(session_id) as lease:
+            completion = await lease.client.chat.completions.create(
+                model=self.rephrase_model_name,
+                messages=prompt,
+                temperature=0.05,
+                top_p=0.95,
+                max_tokens=500,
+                stream=False,
+            )
         return completion.choices[0].message.content.strip()
         
 
-    async def _answer(self, prompt: List[Dict[str, str]]) -> AsyncGenerator[str, None]:
-        stream = await self.answer_model_client.chat.completions.create(
-            model=self.answer_model_name,
-            messages=prompt,
-            temperature=0.05,
-            top_p=0.95,
-            max_tokens=4096,
-            stream=True,
-        )
-
-        async for chunk in stream:
-            if chunk.choices[0].delta.content is not None:
-                content = chunk.choices[0].delta.content
-                yield content
+    async def _answer(self, prompt: List[Dict[str, str]], session_id: str = None, use_rephrase_model: bool = False) -> AsyncGenerator[str, None]:
+        pool = self.rephrase_model_pool if use_rephrase_model else self.answer_model_pool
+        async with pool.acquire(session_id) as lease:
+            stream = await lease.client.chat.completions.create(
+                model=self.rephrase_model_name if use_rephrase_model else self.answer_model_name,
+                messages=prompt,
+                temperature=0.05,
+                top_p=0.95,
+                max_tokens=4096,
+                stream=True,
+            )
+
+            completed = False
+            try:
+                async for chunk in stream:
+                    if chunk.choices[0].delta.content is not None:
+                        content = chunk.choices[0].delta.content
+                        lease.count_tokens()
+                        yield content
+                completed = True
+            finally:
+                # Closing the HTTP stream makes the model server abort the generation
+                await stream.close()
+                self._record_stream_end(lease.tokens, completed)
+
+    def _record_stream_end(self, tokens: int, completed: bool) -> None:
+        if completed:
+            self.utils.metrics.observe("llm.completion_tokens", tokens)
+            return
+
+        self.utils.metrics.increment("llm.aborted_streams")
+        average_tokens = self.utils.metrics.mean("llm.completion_tokens")
+        if average_tokens is not None:
+            self.utils.metrics.increment("llm.tokens_saved", max(0.0, average_tokens - tokens))
     
 
-    def _get_answer_prompt(self, current_question: str, context: str, chat_history: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    async def close(self) -> None:
+        await self.rephrase_model_pool.close()
+        await self.answer_model_pool.close()
+
+    def _record_history_tokens(
+            self, chat_history: List[Dict[str, str]], chat_summary: str, recent_history: List[Dict[str, str]]
+        ) -> None:
+        # Baseline is the history the prompts carried before summaries, the last turns verbatim
+        baseline = estimate_tokens(self._format_chat_history(chat_history, ""))
+        actual = estimate_tokens(self._format_chat_history(recent_history, chat_summary))
+        self.utils.metrics.observe("prompt.history_tokens.baseline", baseline)
+        self.utils.metrics.observe("prompt.history_tokens.actual", actual)
+        self.utils.metrics.observe("prompt.history_tokens.saved", baseline - actual)
+
+    def _format_chat_history(self, chat_history: List[Dict[str, str]], chat_summary: str) -> str:
         chat_history_str = json.dumps(
             chat_history[-self.answers_prompt_history_size:], 
             indent=2, ensure_ascii=False)
+        if chat_summary:
+            chat_history_str = f"Summary of the earlier conversation: {chat_summary}\n\nRecent messages:\n{chat_history_str}"
+        return chat_history_str
+
+    def _get_answer_prompt(self, current_question: str, context: str, chat_history: List[Dict[str, str]], chat_summary: str = "") -> List[Dict[str, str]]:
+        chat_history_str = self._format_chat_history(chat_history, chat_summary)
         messages = [
             {"role": "system", "content": ANSWER_SYSTEM_MSG},
             {"role": "user", "content": ANSWER_PROMPT.format(context, chat_history_str, current_question)}
@@ -260,10 +609,8 @@ class ChatBot:
         return messages
     
     
-    def _get_rephrase_prompt(self, current_question: str, chat_history: List[Dict[str, str]]) -> List[Dict[str, str]]:
-        chat_history_str = json.dumps(
-            chat_history[-self.answers_prompt_history_size:], 
-            indent=2, ensure_ascii=False)
+    def _get_rephrase_prompt(self, current_question: str, chat_history: List[Dict[str, str]], chat_summary: str = "") -> List[Dict[str, str]]:
+        chat_history_str = self._format_chat_history(chat_history, chat_summary)
         messages = [
             {"role": "user", "content": REPHRASE_PROMPT.format(chat_history_str, current_question)}
         ]
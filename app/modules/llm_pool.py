@@ -0,0 +1,190 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+
+import httpx
+from openai import APIConnectionError, APITimeoutError, AsyncOpenAI, InternalServerError
+
+# Errors showing the replica itself is unreachable or failing, as opposed to a rejected request
+REPLICA_ERRORS = (APIConnectionError, APITimeoutError, InternalServerError, httpx.TransportError)
+
+class Replica:
+    """
+    A single OpenAI compatible endpoint serving a model, with its current load and health.
+
+    Attributes:
+        base_url (str): The base URL of the endpoint.
+        client (AsyncOpenAI): AsyncOpenAI client bound to the endpoint.
+        outstanding (int): Number of requests currently in flight.
+        streamed_tokens (int): Number of tokens streamed so far by the requests in flight.
+        healthy (bool): Whether the replica receives traffic.
+        failures (int): Number of consecutive failures.
+    """
+
+    def __init__(self, base_url: str, api_key: str, http_client: httpx.AsyncClient):
+        self.base_url = base_url
+        self.client = AsyncOpenAI(base_url=base_url, api_key=api_key, http_client=http_client)
+        self.outstanding = 0
+        self.streamed_tokens = 0
+        self.healthy = True
+        self.failures = 0
+
+    def load(self):
+        return (self.outstanding, self.streamed_tokens)
+
+class Lease:
+    """
+    A request routed to a replica, used to account for the tokens it streams.
+
+    Attributes:
+        replica (Replica): The replica serving the request.
+        client (AsyncOpenAI): AsyncOpenAI client of the replica.
+        tokens (int): Number of tokens streamed by the request.
+    """
+
+    def __init__(self, replica: Replica):
+        self.replica = replica
+        self.client = replica.client
+        self.tokens = 0
+
+    def count_tokens(self, tokens: int = 1) -> None:
+        self.tokens += tokens
+        self.replica.streamed_tokens += tokens
+
+class LLMClientPool:
+    """
+    Routes requests for a model role across its replicas.
+
+    Requests go to the healthy replica with the fewest outstanding requests, then the fewest
+    tokens being streamed. A session keeps hitting the replica that served it last, which holds
+    its prefix cache, unless that replica has `affinity_slack` more outstanding requests than
+    the least loaded one. Replicas are ejected after `max_failures` consecutive failures, that
+    is connection errors, timeouts and server errors, and reinstated once a background health
+    check succeeds. All replicas share one HTTP client
+    keeping connections alive.
+
+    Attributes:
+        name (str): Name of the model role, used in logs.
+        replicas (List[Replica]): The replicas of the model.
+        health_check_interval (float): Time in seconds between health checks.
+        max_failures (int): Number of consecutive failures after which a replica is ejected.
+        affinity_slack (int): Extra outstanding requests tolerated to keep session affinity.
+        affinity_size (int): Maximum number of sessions remembered for affinity.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            base_urls: List[str],
+            api_key: str,
+            max_connections: int = 100,
+            max_keepalive_connections: int = 20,
+            keepalive_expiry: float = 60,
+            health_check_interval: float = 10,
+            max_failures: int = 3,
+            affinity_slack: int = 2,
+            affinity_size: int = 10000,
+        ):
+        # Lists split from the environment may carry spaces or a trailing comma
+        base_urls = [base_url.strip() for base_url in base_urls if base_url.strip()]
+        if not base_urls:
+            raise ValueError(f"No endpoint configured for {name} model")
+        self.name = name
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(600, connect=5),
+        )
+        self.replicas = [Replica(base_url, api_key, self.http_client) for base_url in base_urls]
+        self.health_check_interval = health_check_interval
+        self.max_failures = max_failures
+        self.affinity_slack = affinity_slack
+        self.affinity_size = affinity_size
+        self._affinity: OrderedDict[str, Replica] = OrderedDict()
+        self._health_check_task: Optional[asyncio.Task] = None
+
+    @asynccontextmanager
+    async def acquire(self, session_id: Optional[str] = None) -> AsyncIterator[Lease]:
+        self.start_health_checks()
+        replica = self._select(session_id)
+        lease = Lease(replica)
+        replica.outstanding += 1
+        try:
+            yield lease
+            self._record_success(replica)
+        except REPLICA_ERRORS:
+            self._record_failure(replica)
+            raise
+        finally:
+            replica.outstanding -= 1
+            replica.streamed_tokens -= lease.tokens
+
+    def _select(self, session_id: Optional[str]) -> Replica:
+        # When every replica is ejected, keep trying all of them rather than failing outright
+        candidates = [replica for replica in self.replicas if replica.healthy] or self.replicas
+        selected = min(candidates, key=Replica.load)
+
+        if session_id is not None:
+            preferred = self._affinity.get(session_id)
+            if preferred in candidates and preferred.outstanding <= selected.outstanding + self.affinity_slack:
+                selected = preferred
+            self._affinity[session_id] = selected
+            self._affinity.move_to_end(session_id)
+            while len(self._affinity) > self.affinity_size:
+                self._affinity.popitem(last=False)
+
+        return selected
+
+    def _record_success(self, replica: Replica) -> None:
+        replica.failures = 0
+
+    def _record_failure(self, replica: Replica) -> None:
+        replica.failures += 1
+        if replica.healthy and replica.failures >= self.max_failures:
+            replica.healthy = False
+            logging.warning(f"Ejecting {self.name} replica {replica.base_url} after {replica.failures} failures")
+
+    def start_health_checks(self) -> None:
+        """
+        Start the background health checks, unless they are already running.
+        """
+        if self._health_check_task is None or self._health_check_task.done():
+            self._health_check_task = asyncio.create_task(self._run_health_checks())
+
+    async def _run_health_checks(self) -> None:
+        while True:
+            await self.check_health()
+            await asyncio.sleep(self.health_check_interval)
+
+    async def check_health(self) -> bool:
+        """
+        Ping every replica, ejecting the failing ones and reinstating the recovered ones.
+
+        Returns:
+            bool: Whether at least one replica is healthy.
+        """
+        results = await asyncio.gather(
+            *(self._ping(replica) for replica in self.replicas), return_exceptions=True)
+        for replica, result in zip(self.replicas, results):
+            if isinstance(result, Exception):
+                logging.warning(f"Health check of {self.name} replica {replica.base_url} failed: {result}")
+                self._record_failure(replica)
+            else:
+                if not replica.healthy:
+                    logging.info(f"Reinstating {self.name} replica {replica.base_url}")
+                replica.healthy = True
+                replica.failures = 0
+        return any(replica.healthy for replica in self.replicas)
+
+    async def _ping(self, replica: Replica) -> None:
+        await asyncio.wait_for(replica.client.models.list(), timeout=5)
+
+    async def close(self) -> None:
+        if self._health_check_task is not None:
+            self._health_check_task.cancel()
+        await self.http_client.aclose()
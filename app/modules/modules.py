@@ -1,5 +1,6 @@
 from typing import Type, TypeVar
 from .chatbot import ChatBot
+from .warmup import Warmup
 
 T = TypeVar('T', bound='Modules')
 
@@ -9,6 +10,7 @@ class Modules:
 
     Attributes:
         chatbot (ChatBot): An instance of the ChatBot module.
+        warmup (Warmup): Warms up the chatbot components and reports their readiness.
     """
 
     _instance: Type[T] | None = None
@@ -21,6 +23,7 @@ class Modules:
 
     def _initialize(self) -> None:
         self.chatbot: ChatBot = ChatBot()
+        self.warmup: Warmup = Warmup(self.chatbot)
 
     @classmethod
     def get_instance(cls: Type[T]) -> T:
@@ -0,0 +1,124 @@
+import json
+import asyncio
+import hashlib
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+class Flight:
+    """
+    A generation whose chunks are broadcast to every request attached to it.
+
+    Chunks are buffered for the lifetime of the flight, so a request attaching late is
+    first replayed the prefix already generated, then receives the new chunks as they come.
+    The generation is cancelled when the last request attached to it goes away.
+
+    Attributes:
+        chunks (List[str]): The chunks generated so far.
+        done (bool): Whether the generation is complete.
+        result (Any): The value returned by the generation once complete.
+        error (BaseException | None): The error that ended the generation, if any.
+        task (asyncio.Task | None): The task running the generation.
+        subscribers (int): Number of requests currently receiving the chunks.
+    """
+
+    def __init__(self) -> None:
+        self.chunks: List[str] = []
+        self.done = False
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.task: Optional[asyncio.Task] = None
+        self.subscribers = 0
+        self._changed = asyncio.Condition()
+
+    async def publish(self, chunk: str) -> None:
+        async with self._changed:
+            self.chunks.append(chunk)
+            self._changed.notify_all()
+
+    async def _finish(self, result: Any = None, error: Optional[BaseException] = None) -> None:
+        async with self._changed:
+            self.result = result
+            self.error = error
+            self.done = True
+            self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncGenerator[str, None]:
+        index = 0
+        self.subscribers += 1
+        try:
+            while True:
+                async with self._changed:
+                    await self._changed.wait_for(lambda: index < len(self.chunks) or self.done)
+                    chunks = self.chunks[index:]
+                    done = self.done
+                index += len(chunks)
+                for chunk in chunks:
+                    yield chunk
+                if done and index >= len(self.chunks):
+                    break
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done and self.task is not None:
+                self.task.cancel()
+        if self.error is not None:
+            raise self.error
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent generations into a single flight.
+
+    The first request for a key starts the generation; requests for the same key arriving
+    while it runs attach to the same flight instead of starting their own.
+    """
+
+    def __init__(self) -> None:
+        self._flights: Dict[str, Flight] = {}
+
+    @staticmethod
+    def key(*parts: Any) -> str:
+        """
+        Build the key of a generation from everything that determines its output.
+
+        Args:
+            *parts (Any): JSON serializable inputs of the generation, such as the model name and the full prompt.
+
+        Returns:
+            str: The key, identical only for identical inputs.
+        """
+        serialized = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    def join(self, key: Optional[str], generate: Callable[[Flight], Awaitable[Any]]) -> Tuple[Flight, bool]:
+        """
+        Attach to the flight running for a key, or start a new one.
+
+        Args:
+            key (str | None): The key identifying identical requests. None never coalesces.
+            generate (Callable[[Flight], Awaitable[Any]]): Publishes the chunks to the flight
+                and returns its result, only called when a new flight is started.
+
+        Returns:
+            Tuple[Flight, bool]: The flight, and whether it was started by this call.
+        """
+        flight = self._flights.get(key) if key is not None else None
+        # A flight left by all of its requests is being cancelled and cannot be joined
+        if flight is not None and flight.subscribers > 0:
+            return flight, False
+
+        flight = Flight()
+        if key is not None:
+            self._flights[key] = flight
+        flight.task = asyncio.create_task(self._run(key, flight, generate))
+        return flight, True
+
+    async def _run(self, key: Optional[str], flight: Flight, generate: Callable[[Flight], Awaitable[Any]]) -> None:
+        try:
+            result = await generate(flight)
+        except BaseException as e:
+            await flight._finish(error=e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        else:
+            await flight._finish(result=result)
+        finally:
+            if key is not None and self._flights.get(key) is flight:
+                del self._flights[key]
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+from typing import AsyncGenerator, AsyncIterator, Awaitable, Callable, List, Optional
+
+_END = object()
+
+class EventStream:
+    """
+    Frames a stream of text chunks as server-sent events.
+
+    Chunks are coalesced and flushed as a single `data:` event once the buffer holds
+    `flush_bytes` bytes or the oldest buffered chunk is `flush_interval` seconds old.
+    While the source is silent, for example during rephrasing and retrieval, a heartbeat
+    comment is sent every `heartbeat_interval` seconds so proxies neither buffer nor time out.
+    The stream ends with a `done` event. When the client disconnects, the stream stops and
+    the source is cancelled.
+
+    Attributes:
+        source (AsyncIterator[str]): The text chunks to send.
+        flush_interval (float): Maximum time in seconds a chunk stays buffered.
+        flush_bytes (int): Buffer size in bytes that triggers a flush.
+        heartbeat_interval (float): Time in seconds without output after which a heartbeat is sent.
+        is_disconnected (Callable[[], Awaitable[bool]] | None): Tells whether the client has disconnected.
+        disconnect_check_interval (float): Time in seconds between two disconnection checks.
+    """
+
+    def __init__(
+            self,
+            source: AsyncIterator[str],
+            flush_interval: float = 0.02,
+            flush_bytes: int = 64,
+            heartbeat_interval: float = 10.0,
+            is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+            disconnect_check_interval: float = 1.0,
+        ):
+        self.source = source
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.heartbeat_interval = heartbeat_interval
+        self.is_disconnected = is_disconnected
+        self.disconnect_check_interval = disconnect_check_interval
+
+    async def events(self) -> AsyncGenerator[str, None]:
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        pump = asyncio.create_task(self._pump(queue))
+
+        buffer: List[str] = []
+        buffered_bytes = 0
+        first_buffered_at = 0.0
+        last_sent_at = last_checked_at = loop.time()
+
+        try:
+            while True:
+                now = loop.time()
+                if self.is_disconnected is not None and now - last_checked_at >= self.disconnect_check_interval:
+                    last_checked_at = now
+                    if await self.is_disconnected():
+                        logging.info("Client disconnected, cancelling answer generation")
+                        return
+
+                if buffer and now - first_buffered_at >= self.flush_interval:
+                    yield self._format_data("".join(buffer))
+                    buffer, buffered_bytes = [], 0
+                    last_sent_at = loop.time()
+                    continue
+                if not buffer and now - last_sent_at >= self.heartbeat_interval:
+                    yield ": heartbeat\n\n"
+                    last_sent_at = loop.time()
+                    continue
+
+                deadline = first_buffered_at + self.flush_interval if buffer else last_sent_at + self.heartbeat_interval
+                if self.is_disconnected is not None:
+                    deadline = min(deadline, last_checked_at + self.disconnect_check_interval)
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=max(0.0, deadline - now))
+                except asyncio.TimeoutError:
+                    continue
+
+                if item is _END:
+                    break
+                if isinstance(item, Exception):
+                    if buffer:
+                        yield self._format_data("".join(buffer))
+                    yield "event: error\ndata: An error occurred while generating the answer.\n\n"
+                    return
+
+                if not buffer:
+                    first_buffered_at = loop.time()
+                buffer.append(item)
+                buffered_bytes += len(item.encode("utf-8"))
+                if buffered_bytes >= self.flush_bytes:
+                    yield self._format_data("".join(buffer))
+                    buffer, buffered_bytes = [], 0
+                    last_sent_at = loop.time()
+
+            if buffer:
+                yield self._format_data("".join(buffer))
+            yield "event: done\ndata: [DONE]\n\n"
+        finally:
+            # Cancelling the pump cancels the source, down to the upstream model stream
+            pump.cancel()
+
+    async def _pump(self, queue: asyncio.Queue) -> None:
+        try:
+            async for chunk in self.source:
+                if chunk:
+                    queue.put_nowait(chunk)
+            queue.put_nowait(_END)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.exception(f"Answer stream failed: {e}")
+            queue.put_nowait(e)
+        finally:
+            if hasattr(self.source, "aclose"):
+                await self.source.aclose()
+
+    @staticmethod
+    def _format_data(text: str) -> str:
+        lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+        return "".join(f"data: {line}\n" for line in lines) + "\n"
@@ -0,0 +1,151 @@
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from sqlalchemy import text
+from langdetect import detect
+from .chatbot import ChatBot
+from .llm_pool import LLMClientPool
+
+class Warmup:
+    """
+    Primes the models, connection pools and caches before the application takes traffic,
+    and reports the readiness of each component.
+
+    The embedding models run a dummy encode, langdetect loads its profiles, the Mongo and
+    Postgres pools open their connections, and every model replica is pinged and prefilled
+    with the shared start of the prompts so it sits in the prefix cache. The background health
+    checks of the model pools are started first. A failed step is retried with exponential
+    backoff until it succeeds, so a dependency down at startup only delays readiness.
+
+    Attributes:
+        chatbot (ChatBot): The chatbot whose components are warmed up.
+        mongo_connections (int): Number of Mongo connections opened.
+        retry_delay (float): Time in seconds before the first retry of a failed step.
+        max_retry_delay (float): Maximum time in seconds between two retries of a failed step.
+        status (str): "pending", "running" or "done".
+        duration (float | None): Time in seconds taken by the warmup once done.
+        components (Dict[str, Dict[str, Any]]): Status, duration, attempts and last error of each component.
+    """
+
+    def __init__(self, chatbot: ChatBot, mongo_connections: int = 4, retry_delay: float = 1, max_retry_delay: float = 60):
+        self.chatbot = chatbot
+        self.mongo_connections = mongo_connections
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.status = "pending"
+        self.duration = None
+        self.components: Dict[str, Dict[str, Any]] = {}
+
+    async def run(self) -> None:
+        self.status = "running"
+        start = time.perf_counter()
+        self.chatbot.rephrase_model_pool.start_health_checks()
+        self.chatbot.answer_model_pool.start_health_checks()
+        steps: Dict[str, Callable[[], Awaitable[None]]] = {
+            "embeddings": self._warm_embeddings,
+            "langdetect": self._warm_langdetect,
+            "mongo": self._warm_mongo,
+            "postgres": self._warm_postgres,
+            "rephrase_model": lambda: self._warm_model(
+                self.chatbot.rephrase_model_pool, self.chatbot.rephrase_model_name,
+                self.chatbot._get_rephrase_prompt("Hello", [])),
+            "answer_model": lambda: self._warm_model(
+                self.chatbot.answer_model_pool, self.chatbot.answer_model_name,
+                self.chatbot._get_answer_prompt("Hello", "", [])),
+        }
+        for name in steps:
+            self.components[name] = {"status": "pending"}
+
+        await asyncio.gather(*(self._run_step(name, step) for name, step in steps.items()))
+
+        self.duration = time.perf_counter() - start
+        self.status = "done"
+        logging.info(f"Warmup done in {self.duration:.1f}s, ready: {self.is_ready()}")
+
+    async def _run_step(self, name: str, step: Callable[[], Awaitable[None]]) -> None:
+        start = time.perf_counter()
+        delay = self.retry_delay
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                await step()
+                break
+            except Exception as e:
+                logging.error(f"Warmup of {name} failed (attempt {attempts}), retrying in {delay:.0f}s: {e}")
+                self.components[name] = {"status": "retrying", "attempts": attempts, "error": type(e).__name__}
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_retry_delay)
+        self.components[name] = {
+            "status": "ok",
+            "attempts": attempts,
+            "duration_ms": round((time.perf_counter() - start) * 1000),
+        }
+
+    async def _warm_embeddings(self) -> None:
+        await asyncio.to_thread(self.chatbot.embeddings.minilm.get_embeddings, "warmup")
+        await asyncio.to_thread(self.chatbot.embeddings.mpnet.get_embeddings, "warmup")
+
+    async def _warm_langdetect(self) -> None:
+        await asyncio.to_thread(detect, "What is the rate of pay for an acting appointment?")
+
+    async def _warm_mongo(self) -> None:
+        db = self.chatbot.dbs.mongo.db
+        await asyncio.gather(*(db.command("ping") for _ in range(self.mongo_connections)))
+
+    async def _warm_postgres(self) -> None:
+        await asyncio.to_thread(self._open_postgres_pool)
+
+    def _open_postgres_pool(self) -> None:
+        engine = self.chatbot.dbs.postgres.engine
+        connections = [engine.connect() for _ in range(engine.pool.size())]
+        try:
+            for connection in connections:
+                connection.execute(text("SELECT 1"))
+        finally:
+            for connection in connections:
+                connection.close()
+
+    async def _warm_model(self, pool: LLMClientPool, model_name: str, prompt) -> None:
+        if not await pool.check_health():
+            raise ConnectionError(f"No healthy {pool.name} model replica")
+        await asyncio.gather(*(
+            replica.client.chat.completions.create(model=model_name, messages=prompt, max_tokens=1)
+            for replica in pool.replicas if replica.healthy
+        ))
+
+    def is_ready(self) -> bool:
+        if self.status != "done":
+            return False
+        if any(component["status"] != "ok" for component in self.components.values()):
+            return False
+        pools = (self.chatbot.rephrase_model_pool, self.chatbot.answer_model_pool)
+        return all(any(replica.healthy for replica in pool.replicas) for pool in pools)
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Readiness and status of each component, safe to expose to unauthenticated probes.
+        """
+        return {
+            "ready": self.is_ready(),
+            "components": {name: component["status"] for name, component in self.components.items()},
+        }
+
+    def details(self) -> Dict[str, Any]:
+        """
+        Full warmup report, with the errors of the components and the replica endpoints.
+        """
+        return {
+            "ready": self.is_ready(),
+            "warmup": {
+                "status": self.status,
+                "duration_ms": round(self.duration * 1000) if self.duration is not None else None,
+            },
+            "components": self.components,
+            "replicas": {
+                pool.name: {replica.base_url: replica.healthy for replica in pool.replicas}
+                for pool in (self.chatbot.rephrase_model_pool, self.chatbot.answer_model_pool)
+            },
+        }
@@ -1 +1 @@
-from .prompts import REPHRASE_PROMPT, ANSWER_PROMPT, ANSWER_SYSTEM_MSG
\ No newline at end of file
+from .prompts import REPHRASE_PROMPT, ANSWER_PROMPT, ANSWER_SYSTEM_MSG, SUMMARY_PROMPT
\ No newline at end of file
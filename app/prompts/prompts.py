@@ -101,4 +101,19 @@ Given information:
 Please provide a response to the user.
 """
 
-ANSWER_SYSTEM_MSG = """You are 'Virtual Assistant', a chatbot assistant for Compensation Advisors at Public Services and Procurement Canada."""
\ No newline at end of file
+ANSWER_SYSTEM_MSG = """You are 'Virtual Assistant', a chatbot assistant for Compensation Advisors at Public Services and Procurement Canada."""
+
+SUMMARY_PROMPT = """Instructions:
+Below is a summary of the earlier part of a conversation between a Compensation Advisor and a virtual assistant, followed by the messages that came after it.
+Write an updated summary of the whole conversation in the language of the conversation.
+Keep the questions asked, the facts given in the answers (rates, dates, classifications, directives and sections referred to) and any detail about the case being discussed.
+Leave out greetings, HTML formatting, links and citations.
+
+------
+Summary:
+{}
+
+Messages:
+{}
+Output only the updated summary with nothing else:
+"""
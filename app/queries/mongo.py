@@ -1,7 +1,13 @@
+import re
+import heapq
 import asyncio
-from typing import List, Dict, Any
+import logging
+import itertools
+from typing import List, Dict, Any, Optional, Tuple
 from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorCollection
 
+COLLECTION_LANGUAGE_PATTERN = re.compile(r"[_-](en|fr)$", re.IGNORECASE)
+
 class Mongo:
     """
     A class for performing MongoDB operations, particularly vector searches across collections.
@@ -15,7 +21,9 @@ class Mongo:
         db: AsyncIOMotorDatabase, 
         query_vector: List[float], 
         collection_name: str, 
-        k: int
+        k: int,
+        search_filter: Optional[Dict[str, Any]] = None,
+        overfetch: int = 5
     ) -> List[Dict[str, Any]]:
         """
         Perform a vector search on a single collection.
@@ -25,18 +33,24 @@ class Mongo:
             query_vector (List[float]): The query vector for the search.
             collection_name (str): The name of the collection to search.
             k (int): The number of results to return.
+            search_filter (Dict[str, Any], optional): Filter pushed into the cosmosSearch stage.
+                The filtered field needs a filter index. Defaults to no filter.
+            overfetch (int, optional): Factor of k fetched before duplicates are grouped. Defaults to 5.
 
         Returns:
             List[Dict[str, Any]]: A list of search results.
         """
+        cosmos_search = {
+            "vector": query_vector,
+            "path": "embedding",
+            "k": k*overfetch,
+        }
+        if search_filter is not None:
+            cosmos_search["filter"] = search_filter
         pipeline = [
             {
                 "$search": {
-                    "cosmosSearch": {
-                        "vector": query_vector,
-                        "path": "embedding",
-                        "k": k*5,
-                    },
+                    "cosmosSearch": cosmos_search,
                     "returnStoredSource": True
                 }
             },
@@ -72,24 +86,166 @@ class Mongo:
         self, 
         db: AsyncIOMotorDatabase, 
         query_vector: List[float], 
-        k: int = 5
+        k: int = 5,
+        deadline: Optional[float] = None,
+        hedge_after: Optional[float] = None,
+        lang: Optional[str] = None,
+        lang_field: Optional[str] = None,
+        fallback_score: Optional[float] = None,
+        overfetch: int = 5,
+        collection_names: Optional[List[str]] = None
     ) -> List[Dict[str, Any]]:
         """
         Perform a vector search across multiple collections asynchronously.
 
+        Results are merged into a bounded top-k heap as each collection completes. When the
+        deadline expires, the collections still pending are cancelled and the partial results
+        are returned.
+
+        When a language is given, only the collections of that language are searched: the
+        collections named with a language suffix (`_en`, `_fr`) of that language, and the
+        collections without suffix, filtered on `lang_field` when it is set. If the best score
+        is below `fallback_score`, the other languages are searched as well.
+
         Args:
             db (AsyncIOMotorDatabase): The MongoDB database instance.
             query_vector (List[float]): The query vector for the search.
             k (int, optional): The number of results to return. Defaults to 5.
+            deadline (float, optional): Time budget of the search in seconds. Defaults to no deadline.
+            hedge_after (float, optional): Delay in seconds after which a duplicate search is sent
+                to every collection still pending, the first answer wins. Defaults to no hedging.
+            lang (str, optional): Language of the question. Defaults to searching every language.
+            lang_field (str, optional): Document field holding the language, used to filter the
+                collections without language suffix. Defaults to no filter.
+            fallback_score (float, optional): Best score below which the other languages are
+                searched as well. Defaults to no fallback.
+            overfetch (int, optional): Factor of k fetched from each collection before duplicates
+                are grouped. Defaults to 5.
+            collection_names (List[str], optional): Collections to search. Defaults to all collections.
 
         Returns:
             List[Dict[str, Any]]: A list of search results from all collections, sorted by score.
         """
-        collection_names = await db.get_collection_names()
-        tasks = [self.search_single_collection(db.db, query_vector, name, k) for name in collection_names]
-        results = await asyncio.gather(*tasks)
-        
-        all_results = [item for sublist in results for item in sublist]
-        all_results.sort(key=lambda x: x['score'], reverse=True)
-
-        return all_results[:k]
\ No newline at end of file
+        if collection_names is None:
+            collection_names = await db.get_collection_names()
+        if lang is None:
+            return await self._search_collections(
+                db.db, query_vector, collection_names, k, deadline, hedge_after, overfetch=overfetch)
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        own_names = [name for name in collection_names if self._collection_language(name) in (lang, None)]
+        other_names = [name for name in collection_names if name not in own_names]
+        # Suffixed collections hold a single language, only the shared ones are filtered
+        filtered_names = []
+        if lang_field is not None:
+            filtered_names = [name for name in own_names if self._collection_language(name) is None]
+        search_filters = {name: {lang_field: {"$eq": lang}} for name in filtered_names}
+        results = await self._search_collections(
+            db.db, query_vector, own_names, k, deadline, hedge_after, search_filters, overfetch)
+
+        if fallback_score is None or (results and results[0]['score'] >= fallback_score):
+            return results
+
+        # Shared collections are searched again without the language filter
+        fallback_names = other_names + filtered_names
+        remaining = deadline - (loop.time() - start) if deadline is not None else None
+        if not fallback_names or (remaining is not None and remaining <= 0):
+            return results
+
+        logging.info(f"Weak results in {lang} collections, falling back to cross-language search")
+        fallback_results = await self._search_collections(
+            db.db, query_vector, fallback_names, k, remaining, hedge_after, overfetch=overfetch)
+        merged = {(item['collection'], item['_id']): item for item in fallback_results + results}
+        return heapq.nlargest(k, merged.values(), key=lambda item: item['score'])
+
+    def _collection_language(self, collection_name: str) -> Optional[str]:
+        match = COLLECTION_LANGUAGE_PATTERN.search(collection_name)
+        return match.group(1).lower() if match else None
+
+    async def _search_collections(
+        self,
+        db: AsyncIOMotorDatabase,
+        query_vector: List[float],
+        collection_names: List[str],
+        k: int,
+        deadline: Optional[float],
+        hedge_after: Optional[float],
+        search_filters: Optional[Dict[str, Dict[str, Any]]] = None,
+        overfetch: int = 5
+    ) -> List[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        search_filters = search_filters or {}
+
+        tasks: Dict[asyncio.Task, str] = {
+            asyncio.create_task(self.search_single_collection(
+                db, query_vector, name, k, search_filters.get(name), overfetch)): name
+            for name in collection_names
+        }
+        pending = set(tasks)
+        hedged = set()
+        latencies: Dict[str, float] = {}
+        top_k: List[Tuple[float, int, Dict[str, Any]]] = []
+        sequence = itertools.count()
+
+        try:
+            while pending:
+                now = loop.time()
+                if deadline is not None and now - start >= deadline:
+                    break
+
+                timeouts = []
+                if deadline is not None:
+                    timeouts.append(start + deadline - now)
+                if hedge_after is not None and any(tasks[task] not in hedged for task in pending):
+                    timeouts.append(max(0.0, start + hedge_after - now))
+
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=min(timeouts) if timeouts else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+
+                for task in done:
+                    name = tasks[task]
+                    if task.cancelled() or name in latencies:
+                        continue
+                    if task.exception() is not None:
+                        logging.error(f"Vector search on collection {name} failed: {task.exception()}")
+                        continue
+                    latencies[name] = loop.time() - start
+                    for item in task.result():
+                        entry = (item['score'], next(sequence), item)
+                        if len(top_k) < k:
+                            heapq.heappush(top_k, entry)
+                        else:
+                            heapq.heappushpop(top_k, entry)
+
+                # Drop the duplicate of every collection that has already answered
+                for task in [task for task in pending if tasks[task] in latencies]:
+                    task.cancel()
+                    pending.discard(task)
+
+                if hedge_after is not None and loop.time() - start >= hedge_after:
+                    for task in list(pending):
+                        name = tasks[task]
+                        if name not in hedged:
+                            hedged.add(name)
+                            hedge = asyncio.create_task(self.search_single_collection(
+                                db, query_vector, name, k, search_filters.get(name), overfetch))
+                            tasks[hedge] = name
+                            pending.add(hedge)
+        finally:
+            for task in pending:
+                task.cancel()
+
+        timed_out = sorted({tasks[task] for task in pending} - set(latencies))
+        logging.info(
+            "Vector search latencies (ms): "
+            + ", ".join(f"{name}={latency * 1000:.0f}" for name, latency in sorted(latencies.items()))
+            + (f"; cancelled after deadline: {', '.join(timed_out)}" if timed_out else "")
+            + (f"; hedged: {', '.join(sorted(hedged))}" if hedged else "")
+        )
+
+        return [item for _, _, item in sorted(top_k, key=lambda entry: entry[0], reverse=True)]
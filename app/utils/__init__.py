@@ -1 +1,3 @@
-from .utils import Utils
\ No newline at end of file
+from .utils import Utils
+from .tokens import estimate_tokens
+from .profiler import span, mark
\ No newline at end of file
@@ -0,0 +1,44 @@
+from collections import defaultdict
+from typing import Any, Dict
+
+class Metrics:
+    """
+    Keeps in-process counters and observations, such as routing decisions or latencies,
+    exposed through the metrics endpoint.
+
+    Attributes:
+        counters (Dict[str, float]): Counters by name.
+        observations (Dict[str, Dict[str, float]]): Count, sum, min and max of observed values by name.
+    """
+
+    def __init__(self) -> None:
+        self.counters: Dict[str, float] = defaultdict(float)
+        self.observations: Dict[str, Dict[str, float]] = {}
+
+    def increment(self, name: str, value: float = 1) -> None:
+        self.counters[name] += value
+
+    def observe(self, name: str, value: float) -> None:
+        observation = self.observations.get(name)
+        if observation is None:
+            self.observations[name] = {"count": 1, "sum": value, "min": value, "max": value}
+        else:
+            observation["count"] += 1
+            observation["sum"] += value
+            observation["min"] = min(observation["min"], value)
+            observation["max"] = max(observation["max"], value)
+
+    def mean(self, name: str) -> float | None:
+        observation = self.observations.get(name)
+        if observation is None:
+            return None
+        return observation["sum"] / observation["count"]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "counters": dict(self.counters),
+            "observations": {
+                name: {**observation, "mean": observation["sum"] / observation["count"]}
+                for name, observation in self.observations.items()
+            },
+        }
@@ -0,0 +1,231 @@
+import io
+import os
+import json
+import time
+import random
+import pstats
+import asyncio
+import cProfile
+import logging
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, Iterator, List, Optional
+
+_current_trace: ContextVar[Optional['RequestTrace']] = ContextVar("request_trace", default=None)
+
+class RequestTrace:
+    """
+    Timeline of the steps of a single request.
+
+    Spans are recorded with the name of the asyncio task running them, so steps running
+    concurrently, like the answer and origin generations, appear side by side.
+
+    Attributes:
+        name (str): Name of the request, usually its endpoint.
+        metadata (Dict[str, Any]): Identifiers of the request, such as its session.
+        started_at (float): Wall clock time at which the request started.
+        spans (List[Dict[str, Any]]): Recorded steps, with start and end offsets in milliseconds.
+        duration (float | None): Time in seconds taken by the request once complete.
+    """
+
+    def __init__(self, name: str, metadata: Dict[str, Any]):
+        self.name = name
+        self.metadata = metadata
+        self.started_at = time.time()
+        self.spans: List[Dict[str, Any]] = []
+        self.duration: Optional[float] = None
+        self._start = time.perf_counter()
+
+    def offset_ms(self) -> float:
+        return round((time.perf_counter() - self._start) * 1000, 2)
+
+    def time_to_first_chunk(self) -> Optional[float]:
+        """
+        Time in seconds until the first chunk of the response, if the request streams one.
+        """
+        for entry in self.spans:
+            if entry["name"] == "first_chunk":
+                return entry["start_ms"] / 1000
+        return None
+
+    def record(self, name: str, start_ms: float, end_ms: float) -> None:
+        task = asyncio.current_task()
+        self.spans.append({
+            "name": name,
+            "task": task.get_name() if task is not None else None,
+            "start_ms": start_ms,
+            "end_ms": end_ms,
+        })
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """
+    Record a step of the current request in its trace, if the request is traced.
+
+    Args:
+        name (str): Name of the step.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start_ms = trace.offset_ms()
+    try:
+        yield
+    finally:
+        trace.record(name, start_ms, trace.offset_ms())
+
+def mark(name: str) -> None:
+    """
+    Record an instant of the current request in its trace, if the request is traced.
+
+    Args:
+        name (str): Name of the instant.
+    """
+    trace = _current_trace.get()
+    if trace is not None:
+        offset = trace.offset_ms()
+        trace.record(name, offset, offset)
+
+class Profiler:
+    """
+    Traces requests and persists the traces of profiled and slow requests for later analysis.
+
+    Every request gets a lightweight timeline of its steps. A request is profiled when asked
+    for, or randomly at `sample_rate`: a CPU profile is then taken while it runs. Note the CPU
+    profile covers the whole event loop thread, so it includes the concurrent requests.
+    The event loop lag is sampled continuously and the samples taken during a request are
+    attached to its trace. Traces of profiled requests and of slow requests are written to
+    `trace_dir`. A streamed request is slow when its first chunk comes after
+    `slow_request_threshold`, as its total duration is paced by the client and the answer
+    length; other requests are judged on their duration. The oldest files are deleted once
+    `trace_dir` holds more than `max_trace_files` files or `max_trace_bytes` bytes.
+
+    Attributes:
+        sample_rate (float): Share of the requests profiled without being asked for.
+        slow_request_threshold (float): Time in seconds to the first chunk, or duration, above which a trace is persisted.
+        trace_dir (str): Directory the traces are written to.
+        max_trace_files (int): Maximum number of files kept in `trace_dir`.
+        max_trace_bytes (int): Maximum total size in bytes of the files kept in `trace_dir`.
+        lag_interval (float): Time in seconds between two event loop lag samples.
+    """
+
+    def __init__(self) -> None:
+        self.sample_rate = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+        self.slow_request_threshold = float(os.environ.get('SLOW_REQUEST_THRESHOLD', 5))
+        self.trace_dir = os.environ.get('PROFILE_TRACE_DIR', './traces')
+        self.max_trace_files = int(os.environ.get('PROFILE_TRACE_MAX_FILES', 500))
+        self.max_trace_bytes = int(os.environ.get('PROFILE_TRACE_MAX_BYTES', 200 * 1024 * 1024))
+        self.lag_interval = 0.05
+        self._lag_samples: deque = deque(maxlen=int(600 / self.lag_interval))
+        self._lag_task: Optional[asyncio.Task] = None
+        self._cpu_profiling = False
+
+    @asynccontextmanager
+    async def trace(self, name: str, profiled: bool = False, metadata: Optional[Dict[str, Any]] = None) -> AsyncIterator[RequestTrace]:
+        profiled = profiled or random.random() < self.sample_rate
+        self._ensure_lag_monitor()
+
+        trace = RequestTrace(name, metadata or {})
+        # Only one CPU profiler can be active at a time in a thread
+        profile = None
+        if profiled and not self._cpu_profiling:
+            self._cpu_profiling = True
+            profile = cProfile.Profile()
+            profile.enable()
+
+        token = _current_trace.set(trace)
+        try:
+            yield trace
+        finally:
+            try:
+                _current_trace.reset(token)
+            except ValueError:
+                # The request ended in another context, for instance when its stream was closed by the server
+                pass
+            if profile is not None:
+                profile.disable()
+                self._cpu_profiling = False
+            trace.duration = time.perf_counter() - trace._start
+            time_to_first_chunk = trace.time_to_first_chunk()
+            latency = time_to_first_chunk if time_to_first_chunk is not None else trace.duration
+
+            if profiled or latency >= self.slow_request_threshold:
+                lag = [lag for at, lag in self._lag_samples if at >= trace.started_at]
+                try:
+                    await asyncio.to_thread(self._persist, trace, lag, profile)
+                except Exception as e:
+                    logging.error(f"Failed to persist trace of {trace.name} request: {e}")
+
+    async def trace_stream(
+            self, stream: AsyncIterator[str], name: str, profiled: bool = False, metadata: Optional[Dict[str, Any]] = None
+        ) -> AsyncGenerator[str, None]:
+        async with self.trace(name, profiled, metadata):
+            async for chunk in stream:
+                yield chunk
+
+    def _ensure_lag_monitor(self) -> None:
+        if self._lag_task is None or self._lag_task.done():
+            self._lag_task = asyncio.create_task(self._monitor_lag())
+
+    async def _monitor_lag(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+            self._lag_samples.append((time.time(), max(0.0, loop.time() - expected)))
+
+    def _persist(self, trace: RequestTrace, lag: List[float], profile: Optional[cProfile.Profile]) -> None:
+        os.makedirs(self.trace_dir, exist_ok=True)
+        time_to_first_chunk = trace.time_to_first_chunk()
+        file_name = f"{time.strftime('%Y%m%dT%H%M%S', time.localtime(trace.started_at))}_{trace.name}_{id(trace):x}"
+        report = {
+            "name": trace.name,
+            "metadata": trace.metadata,
+            "started_at": trace.started_at,
+            "duration_ms": round(trace.duration * 1000, 2),
+            "time_to_first_chunk_ms": round(time_to_first_chunk * 1000, 2) if time_to_first_chunk is not None else None,
+            "spans": trace.spans,
+            "loop_lag_ms": {
+                "samples": len(lag),
+                "mean": round(sum(lag) / len(lag) * 1000, 2) if lag else None,
+                "max": round(max(lag) * 1000, 2) if lag else None,
+            },
+        }
+        if profile is not None:
+            profile.dump_stats(os.path.join(self.trace_dir, f"{file_name}.prof"))
+            stats = io.StringIO()
+            pstats.Stats(profile, stream=stats).sort_stats("cumulative").print_stats(40)
+            report["cpu_profile"] = stats.getvalue()
+
+        with open(os.path.join(self.trace_dir, f"{file_name}.json"), "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2, ensure_ascii=False, default=str)
+        logging.info(f"Trace of {trace.name} request ({report['duration_ms']} ms) written to {self.trace_dir}")
+        self._prune()
+
+    def _prune(self) -> None:
+        files = []
+        for entry in os.scandir(self.trace_dir):
+            try:
+                if entry.is_file():
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+            except FileNotFoundError:
+                # Removed meanwhile by the persistence of a concurrent request
+                continue
+        files.sort()
+
+        total_bytes = sum(size for _, size, _ in files)
+        removed = 0
+        for _, size, path in files:
+            if len(files) - removed <= self.max_trace_files and total_bytes <= self.max_trace_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            removed += 1
+            total_bytes -= size
+        if removed:
+            logging.info(f"Removed the {removed} oldest trace files from {self.trace_dir}")
@@ -0,0 +1,11 @@
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens of a text, at about four characters per Llama token.
+
+    Args:
+        text (str): The text to measure.
+
+    Returns:
+        int: The estimated number of tokens.
+    """
+    return (len(text) + 3) // 4
@@ -1,5 +1,7 @@
 from .logs import Logs
 from .vault import Vault
+from .metrics import Metrics
+from .profiler import Profiler
 from typing import Type, TypeVar, Any
 
 T = TypeVar('T', bound='Utils')
@@ -11,6 +13,9 @@ class Utils:
 
     Attributes:
         vault (Vault): An instance of the Vault for managing secrets.
+        logs (Logs): An instance of Logs for storing session data.
+        metrics (Metrics): An instance of Metrics for in-process counters and observations.
+        profiler (Profiler): An instance of Profiler for request traces and profiles.
     """
 
     _instance: Type[T] | None = None
@@ -24,6 +29,8 @@ class Utils:
     def _initialize(self) -> None:
         self.vault: Vault = Vault()
         self.logs: Logs = Logs()
+        self.metrics: Metrics = Metrics()
+        self.profiler: Profiler = Profiler()
 
     @classmethod
     def get_instance(cls: Type[T]) -> T:
@@ -0,0 +1,28 @@
+import os
+import sys
+import importlib.util
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+
+# The application imports its packages relative to the app directory
+sys.path.insert(0, APP_DIR)
+
+
+def load_module(relative_path):
+    """
+    Import a single module of the application without running its package `__init__`,
+    which pulls in the database drivers and models.
+
+    Args:
+        relative_path (str): Path of the module file relative to the app directory.
+
+    Returns:
+        module: The imported module.
+    """
+    name = "app_" + relative_path.replace("/", "_").removesuffix(".py")
+    if name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(name, os.path.join(APP_DIR, relative_path))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return sys.modules[name]
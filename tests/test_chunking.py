@@ -0,0 +1,34 @@
+import pytest
+
+from conftest import load_module
+
+chunking = load_module("ingestion/chunking.py")
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("abcdefghi\n\nxy", ["abcdefghi", "xy"]),
+    ("abcdefghij", ["abcdefghij"]),
+    ("abcd\n\nef", ["abcd\n\nef"]),
+    ("abcd\n\nefgh\n\nij", ["abcd\n\nefgh", "ij"]),
+    ("\n\n  \n\n", []),
+])
+def test_split_text_packs_paragraphs(text, expected):
+    assert chunking.split_text(text, 10, 2) == expected
+
+
+def test_split_text_windows_long_paragraph():
+    chunks = chunking.split_text("ab\n\n" + "0123456789abcdef", 10, 2)
+    assert chunks == ["ab", "0123456789", "89abcdef"]
+    assert all(chunks)
+
+
+def test_hash_chunk_depends_on_model_source_origin_and_text():
+    base = chunking.hash_chunk("mpnet", "source", "origin", "text")
+    assert base == chunking.hash_chunk("mpnet", "source", "origin", "text")
+    assert len({
+        base,
+        chunking.hash_chunk("minilm", "source", "origin", "text"),
+        chunking.hash_chunk("mpnet", "other", "origin", "text"),
+        chunking.hash_chunk("mpnet", "source", "other", "text"),
+        chunking.hash_chunk("mpnet", "source", "origin", "other"),
+    }) == 5
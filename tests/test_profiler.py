@@ -0,0 +1,52 @@
+import os
+import asyncio
+
+from conftest import load_module
+
+profiler = load_module("utils/profiler.py")
+
+
+def make_profiler(trace_dir, **settings):
+    instance = profiler.Profiler()
+    instance.trace_dir = str(trace_dir)
+    for name, value in settings.items():
+        setattr(instance, name, value)
+    return instance
+
+
+async def stream(instance, delay_before_first_chunk, chunks):
+    async def events():
+        await asyncio.sleep(delay_before_first_chunk)
+        for _ in range(chunks):
+            profiler.mark("first_chunk")
+            yield "chunk"
+            await asyncio.sleep(0.01)
+
+    return [chunk async for chunk in instance.trace_stream(events(), "chat")]
+
+
+def test_long_stream_with_fast_first_chunk_is_not_persisted(tmp_path):
+    instance = make_profiler(tmp_path, slow_request_threshold=0.05)
+    asyncio.run(stream(instance, 0, 10))
+    assert not os.listdir(tmp_path)
+
+
+def test_slow_first_chunk_is_persisted(tmp_path):
+    instance = make_profiler(tmp_path, slow_request_threshold=0.05)
+    asyncio.run(stream(instance, 0.06, 1))
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_oldest_traces_are_pruned(tmp_path):
+    instance = make_profiler(tmp_path, max_trace_files=3, max_trace_bytes=10_000)
+    for index in range(5):
+        path = tmp_path / f"old_{index}.json"
+        path.write_text("x" * 100)
+        os.utime(path, (index, index))
+
+    instance._prune()
+    assert sorted(os.listdir(tmp_path)) == ["old_2.json", "old_3.json", "old_4.json"]
+
+    instance.max_trace_bytes = 150
+    instance._prune()
+    assert os.listdir(tmp_path) == ["old_4.json"]
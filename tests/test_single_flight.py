@@ -0,0 +1,150 @@
+import asyncio
+
+import pytest
+
+from conftest import load_module
+
+single_flight = load_module("modules/single_flight.py")
+SingleFlight = single_flight.SingleFlight
+
+
+def answer_prompt(history, question="What is the rate of pay?"):
+    return [
+        {"role": "system", "content": "system"},
+        {"role": "user", "content": f"Context: same\nHistory: {history}\nQuestion: {question}"},
+    ]
+
+
+async def collect(flight):
+    return [chunk async for chunk in flight.subscribe()]
+
+
+def test_sessions_with_different_histories_do_not_share_a_flight():
+    async def scenario():
+        registry = SingleFlight()
+        release = asyncio.Event()
+
+        async def generate(flight):
+            await release.wait()
+            await flight.publish("answer")
+
+        key_a = registry.key("model", answer_prompt("[{'user': 'case 123 details'}]"))
+        key_b = registry.key("model", answer_prompt("[]"))
+        assert key_a != key_b
+        assert registry.key("model", answer_prompt("[]")) == key_b
+        assert registry.key("other-model", answer_prompt("[]")) != key_b
+
+        flight_a, started_a = registry.join(key_a, generate)
+        flight_b, started_b = registry.join(key_b, generate)
+        assert started_a and started_b
+        assert flight_a is not flight_b
+        release.set()
+        await asyncio.gather(collect(flight_a), collect(flight_b))
+
+    asyncio.run(scenario())
+
+
+def test_late_joiner_is_replayed_the_prefix():
+    async def scenario():
+        registry = SingleFlight()
+        first_chunk_sent = asyncio.Event()
+        release = asyncio.Event()
+
+        async def generate(flight):
+            await flight.publish("a")
+            first_chunk_sent.set()
+            await release.wait()
+            await flight.publish("b")
+            return "origin"
+
+        flight, started = registry.join("key", generate)
+        first = asyncio.create_task(collect(flight))
+        await first_chunk_sent.wait()
+
+        joined, started_late = registry.join("key", generate)
+        assert started and not started_late
+        assert joined is flight
+        late = asyncio.create_task(collect(joined))
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await first == ["a", "b"]
+        assert await late == ["a", "b"]
+        assert flight.result == "origin"
+
+    asyncio.run(scenario())
+
+
+def test_error_reaches_every_subscriber():
+    async def scenario():
+        registry = SingleFlight()
+        release = asyncio.Event()
+
+        async def generate(flight):
+            await flight.publish("partial")
+            await release.wait()
+            raise ConnectionError("replica down")
+
+        flight, _ = registry.join("key", generate)
+        subscribers = [asyncio.create_task(collect(flight)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+
+        results = await asyncio.gather(*subscribers, return_exceptions=True)
+        assert all(isinstance(result, ConnectionError) for result in results)
+
+    asyncio.run(scenario())
+
+
+def test_generation_is_cancelled_when_last_subscriber_leaves():
+    async def scenario():
+        registry = SingleFlight()
+        cancelled = asyncio.Event()
+
+        async def generate(flight):
+            await flight.publish("a")
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        flight, _ = registry.join("key", generate)
+        subscribers = [asyncio.create_task(collect(flight)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+
+        subscribers[0].cancel()
+        await asyncio.sleep(0.01)
+        assert not cancelled.is_set()
+
+        subscribers[1].cancel()
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+        await asyncio.gather(*subscribers, return_exceptions=True)
+        with pytest.raises(asyncio.CancelledError):
+            await flight.task
+
+    asyncio.run(scenario())
+
+
+def test_flight_without_subscribers_is_not_rejoined():
+    async def scenario():
+        registry = SingleFlight()
+
+        async def generate(flight):
+            await flight.publish("a")
+            await asyncio.sleep(60)
+
+        flight, _ = registry.join("key", generate)
+        stream = flight.subscribe()
+        assert await stream.__anext__() == "a"
+        await stream.aclose()
+
+        # The abandoned flight is still registered while its cancellation completes
+        assert registry._flights["key"] is flight
+        rejoined, started = registry.join("key", generate)
+        assert started
+        assert rejoined is not flight
+        rejoined.task.cancel()
+        await asyncio.gather(flight.task, rejoined.task, return_exceptions=True)
+
+    asyncio.run(scenario())
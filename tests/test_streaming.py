@@ -0,0 +1,99 @@
+import asyncio
+
+from conftest import load_module
+
+streaming = load_module("modules/streaming.py")
+EventStream = streaming.EventStream
+
+
+async def chunks(items, delay=0.0):
+    for item in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield item
+
+
+async def collect(stream):
+    return [event async for event in stream.events()]
+
+
+def test_chunks_are_coalesced_and_stream_ends_with_done():
+    events = asyncio.run(collect(EventStream(chunks(["Hel", "lo", " world"]), flush_interval=1, flush_bytes=64)))
+    assert events == ["data: Hello world\n\n", "event: done\ndata: [DONE]\n\n"]
+
+
+def test_buffer_is_flushed_once_flush_bytes_is_reached():
+    events = asyncio.run(collect(EventStream(chunks(["abc", "def", "g"]), flush_interval=1, flush_bytes=6)))
+    assert events == ["data: abcdef\n\n", "data: g\n\n", "event: done\ndata: [DONE]\n\n"]
+
+
+def test_multiline_text_is_framed_as_one_event():
+    events = asyncio.run(collect(EventStream(chunks(["line 1\r\nline 2\n"]), flush_interval=1)))
+    assert events[0] == "data: line 1\ndata: line 2\ndata: \n\n"
+
+
+def test_heartbeat_is_sent_while_source_is_silent():
+    events = asyncio.run(collect(EventStream(chunks(["late"], delay=0.05), heartbeat_interval=0.01)))
+    assert ": heartbeat\n\n" in events
+    assert events[-2:] == ["data: late\n\n", "event: done\ndata: [DONE]\n\n"]
+
+
+def test_source_error_flushes_buffer_then_sends_error_event():
+    async def failing():
+        yield "partial"
+        raise ConnectionError("replica down")
+
+    events = asyncio.run(collect(EventStream(failing(), flush_interval=1)))
+    assert events[0] == "data: partial\n\n"
+    assert events[1].startswith("event: error\n")
+    assert len(events) == 2
+
+
+def test_disconnect_stops_stream_and_cancels_source():
+    async def scenario():
+        source_closed = asyncio.Event()
+        disconnected = False
+
+        async def endless():
+            try:
+                while True:
+                    yield "token"
+                    await asyncio.sleep(0.005)
+            finally:
+                source_closed.set()
+
+        async def is_disconnected():
+            return disconnected
+
+        stream = EventStream(endless(), flush_interval=0.01, is_disconnected=is_disconnected,
+                             disconnect_check_interval=0.01)
+        events = []
+        async for event in stream.events():
+            events.append(event)
+            if len(events) == 2:
+                disconnected = True
+
+        await asyncio.wait_for(source_closed.wait(), timeout=1)
+        assert "event: done\ndata: [DONE]\n\n" not in events
+
+    asyncio.run(scenario())
+
+
+def test_closing_the_stream_cancels_source():
+    async def scenario():
+        source_closed = asyncio.Event()
+
+        async def endless():
+            try:
+                while True:
+                    yield "token"
+                    await asyncio.sleep(0.005)
+            finally:
+                source_closed.set()
+
+        events = EventStream(endless(), flush_interval=0.01).events()
+        await events.__anext__()
+        await events.aclose()
+        await asyncio.wait_for(source_closed.wait(), timeout=1)
+
+    asyncio.run(scenario())
@@ -0,0 +1,61 @@
+import time
+import asyncio
+
+import pytest
+
+pytest.importorskip("motor")
+
+from conftest import load_module
+
+Mongo = load_module("queries/mongo.py").Mongo
+
+
+class FakeMongo(Mongo):
+    """Answers each collection after a delay, with documents scored as given."""
+
+    def __init__(self, collections):
+        self.collections = collections
+        self.calls = []
+
+    async def search_single_collection(self, db, query_vector, collection_name, k, search_filter=None, overfetch=5):
+        self.calls.append((collection_name, search_filter))
+        delays, scores = self.collections[collection_name]
+        # Successive calls to a collection take the successive delays, to simulate a hedged request
+        delay = delays[min(sum(name == collection_name for name, _ in self.calls) - 1, len(delays) - 1)]
+        await asyncio.sleep(delay)
+        if scores is None:
+            raise ConnectionError(f"{collection_name} unavailable")
+        return [{"_id": f"{collection_name}-{i}", "score": score, "collection": collection_name}
+                for i, score in enumerate(scores)]
+
+
+def search(mongo, names, k, deadline=None, hedge_after=None):
+    return asyncio.run(mongo._search_collections(None, [0.0], names, k, deadline, hedge_after))
+
+
+def test_results_are_merged_into_top_k():
+    mongo = FakeMongo({"a": ([0], [0.9, 0.5]), "b": ([0.01], [0.8, 0.7, 0.1]), "c": ([0], [0.95])})
+    results = search(mongo, ["a", "b", "c"], k=3)
+    assert [item["score"] for item in results] == [0.95, 0.9, 0.8]
+
+
+def test_slow_collection_is_cancelled_at_deadline():
+    mongo = FakeMongo({"fast": ([0], [0.5]), "slow": ([5], [0.99])})
+    start = time.perf_counter()
+    results = search(mongo, ["fast", "slow"], k=5, deadline=0.05)
+    assert time.perf_counter() - start < 1
+    assert [item["_id"] for item in results] == ["fast-0"]
+
+
+def test_failed_collection_is_skipped():
+    mongo = FakeMongo({"ok": ([0], [0.5]), "down": ([0], None)})
+    assert [item["_id"] for item in search(mongo, ["ok", "down"], k=5)] == ["ok-0"]
+
+
+def test_hedged_request_answers_for_slow_collection():
+    mongo = FakeMongo({"stuck": ([5, 0], [0.7])})
+    start = time.perf_counter()
+    results = search(mongo, ["stuck"], k=5, deadline=1, hedge_after=0.02)
+    assert time.perf_counter() - start < 1
+    assert [item["_id"] for item in results] == ["stuck-0"]
+    assert len(mongo.calls) == 2